@@ -0,0 +1,102 @@
+"""Admission control for expensive requests under burst load.
+
+At most max_active requests do work at once and up to max_queue more wait
+for a slot. Anything beyond that is shed straight away, as is a request
+whose expected wait (queue length times the recent service time) exceeds
+the latency budget, so overload is answered with a fast 503 instead of
+an ever-growing backlog. A request that does queue but is not admitted
+within the budget is shed too.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Weight of the newest service time in the moving average
+SMOOTHING = 0.2
+
+# Reasons a request is shed, as used in the shed counts
+SHED_REASONS = ('queue_full', 'latency', 'timeout')
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed, retry_after being a hint in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded work queue with load shedding"""
+
+    def __init__(self, max_active=16, max_queue=64, latency_budget=1.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = dict.fromkeys(SHED_REASONS, 0)
+        # Moving average of how long an admitted request holds its slot
+        self.service_time = 0.0
+        self._condition = threading.Condition()
+
+    def expected_wait(self, position):
+        """Seconds until the request at a queue position gets a slot"""
+        return position * self.service_time / self.max_active
+
+    def _shed(self, reason):
+        self.shed[reason] += 1
+        retry_after = max(1, math.ceil(self.expected_wait(self.waiting + 1)))
+        return Overloaded(reason, retry_after)
+
+    def acquire(self):
+        """Wait for a slot, raising Overloaded if the request is shed"""
+        with self._condition:
+            if self.active >= self.max_active:
+                if self.waiting >= self.max_queue:
+                    raise self._shed('queue_full')
+                if self.expected_wait(self.waiting + 1) > self.latency_budget:
+                    raise self._shed('latency')
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + self.latency_budget
+                    while self.active >= self.max_active:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._shed('timeout')
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, duration):
+        with self._condition:
+            self.active -= 1
+            if self.service_time:
+                self.service_time += SMOOTHING * (duration - self.service_time)
+            else:
+                self.service_time = duration
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of a with-block"""
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed': dict(self.shed)
+            }
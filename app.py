@@ -1,17 +1,77 @@
+import atexit
+import cProfile
+import functools
+import gzip
+import hashlib
+import io
 import json
 import os
-import colorsys
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+import random
+import re
+import time
+import zlib
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g
+from flask import before_render_template, request_finished, template_rendered
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
+from admission import AdmissionController, Overloaded
+from metrics import REGISTRY, REQUEST_LATENCY, STAGE_LATENCY, UPLOAD_SIZE, THEME_FAILURES
+from examples_registry import ExamplesRegistry
+from explanations import TEMPLATES as EXPLANATION_TEMPLATES, render_explanation
+from page_cache import PageCache, fingerprint, templates_version
+from palette import PaletteCache, is_hex_color
+from profile_parser import MAX_PROFILE_SIZE, ProfileError, decode, parse_profile, validate_profile
+from similarity import SimilarityIndex
+from single_flight import SingleFlight
+from theme_assets import THEME_CSS_DIR, write_theme_css
+from theme_batch import generate_themes_batch
+from theme_cache import ThemeCache
+from theme_logic import build_theme
+from theme_store import create_store
+
 # Create the Flask application instance
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'json'}
+# Room for multipart boundaries and headers around an uploaded file
+MULTIPART_OVERHEAD = 16 * 1024
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Largest DNA profile accepted from the upload form
+app.config['MAX_PROFILE_SIZE'] = int(os.environ.get('TRAITIFY_MAX_PROFILE_SIZE', MAX_PROFILE_SIZE))
+# Limits for the JSON API, the body size applies after gzip decoding and is
+# also the largest body asgi.py buffers
+app.config['API_MAX_BODY_SIZE'] = int(os.environ.get('TRAITIFY_MAX_BODY_SIZE', 64 * 1024 * 1024))
+app.config['API_MAX_BATCH_SIZE'] = 10000
+# Rendered pages kept in memory, and whether /results links its theme colors
+# as a static, content-hashed stylesheet instead of inlining them
+app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('TRAITIFY_PAGE_CACHE_SIZE', 1000))
+app.config['SPLIT_THEME_CSS'] = os.environ.get('TRAITIFY_SPLIT_THEME_CSS', '') == '1'
+# Part of every page ETag along with the template sources, set per deploy
+app.config['BUILD_ID'] = os.environ.get('TRAITIFY_BUILD_ID', '')
+# Where generated themes are kept, 'memory' or 'sqlite:///path/to/themes.db'
+app.config['THEME_STORE'] = os.environ.get('TRAITIFY_THEME_STORE', 'sqlite:///themes.db')
+app.config['THEME_STORE_TTL'] = int(os.environ.get('TRAITIFY_THEME_STORE_TTL', 24 * 60 * 60))
+# Fraction of requests to run under cProfile, with stats written to PROFILE_DIR
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('TRAITIFY_PROFILE_RATE', 0))
+app.config['PROFILE_DIR'] = os.environ.get('TRAITIFY_PROFILE_DIR', 'profiles')
+# Example profiles shown on /examples, and how often their files are checked for changes
+app.config['EXAMPLES_DIR'] = os.environ.get('TRAITIFY_EXAMPLES_DIR', 'examples')
+app.config['EXAMPLES_CHECK_INTERVAL'] = float(os.environ.get('TRAITIFY_EXAMPLES_CHECK_INTERVAL', 2))
+# File the similar-themes index is restored from at startup and saved to at exit, '' for none
+app.config['SIMILARITY_SNAPSHOT'] = os.environ.get('TRAITIFY_SIMILARITY_SNAPSHOT', '')
+app.config['MAX_SIMILAR'] = 50
+# Most profiles kept in the similar-themes index, which also follows the theme store's TTL and size
+app.config['SIMILARITY_MAX_SIZE'] = int(os.environ.get('TRAITIFY_SIMILARITY_MAX_SIZE', 100000))
+# Uploads and API requests processed at once per process, how many more may wait,
+# and the longest expected wait before new ones are turned away with a 503
+app.config['MAX_ACTIVE_REQUESTS'] = int(os.environ.get('TRAITIFY_MAX_ACTIVE_REQUESTS', 8))
+app.config['MAX_QUEUED_REQUESTS'] = int(os.environ.get('TRAITIFY_MAX_QUEUED_REQUESTS', 64))
+app.config['LATENCY_BUDGET_MS'] = int(os.environ.get('TRAITIFY_LATENCY_BUDGET_MS', 1000))
 
 # Create uploads folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -21,220 +81,65 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def hex_to_rgb(hex_color):
-    """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-
-def rgb_to_hex(rgb):
-    """Convert RGB tuple to hex color string"""
-    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
-
-
-def get_color_from_traits(traits, ancestry):
-    """Generate a color based on personality traits and ancestry"""
-    # Base color generation from extroversion and creativity
-    extroversion = traits.get('extroversion', 0.5)
-    creativity = traits.get('creativity', 0.5)
-    analytical = traits.get('analytical', 0.5)
-
-    # HSV color model: Hue (0-360), Saturation (0-100), Value (0-100)
-
-    # Use extroversion to influence hue (color)
-    # Higher extroversion -> warmer colors (reds, oranges)
-    # Lower extroversion -> cooler colors (blues, greens)
-    base_hue = 0.6 - (extroversion * 0.4)  # Maps 0-1 to 0.6-0.2 (blue to red-orange)
-
-    # Use creativity to influence saturation
-    # More creative -> more saturated colors
-    saturation = 0.5 + (creativity * 0.5)  # Maps 0-1 to 0.5-1.0
-
-    # Use analytical to influence brightness
-    # More analytical -> sharper, clearer colors
-    value = 0.7 + (analytical * 0.3)  # Maps 0-1 to 0.7-1.0
-
-    # Adjust color based on ancestry if significantly present
-    # This can be adjusted with more detailed rules
-
-    # Convert HSV to RGB
-    rgb = colorsys.hsv_to_rgb(base_hue, saturation, value)
-    # Scale to 0-255
-    rgb = tuple(int(c * 255) for c in rgb)
-
-    # Ancestry influence for accent color
-    accent_color = generate_accent_color(rgb, ancestry)
-
-    return {
-        'primary': rgb_to_hex(rgb),
-        'accent': accent_color
-    }
-
-
-def generate_accent_color(primary_rgb, ancestry):
-    """Generate accent color based on primary color and ancestry"""
-    # Convert primary RGB to HSV
-    r, g, b = primary_rgb[0]/255, primary_rgb[1]/255, primary_rgb[2]/255
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-
-    # Adjust hue based on ancestry - move around the color wheel
-    ancestry_hue_shifts = {
-        'european': 0.5,  # Opposite on color wheel
-        'eastern_european': 0.45,
-        'mediterranean': 0.4,
-        'asian': 0.33,
-        'south_asian': 0.25,
-        'african': 0.15,
-        'middle_eastern': 0.2,
-        'native_american': 0.3,
-        'pacific_islander': 0.35,
-        'nordic': 0.55,
-        'central_asian': 0.28
-    }
-
-    # Find dominant ancestry
-    dominant_ancestry = max(ancestry.items(), key=lambda x: x[1])[0]
-    hue_shift = ancestry_hue_shifts.get(dominant_ancestry, 0.5)
-
-    # Apply shift to hue (wrap around if exceeds 1)
-    new_hue = (h + hue_shift) % 1.0
-
-    # Convert back to RGB
-    new_rgb = colorsys.hsv_to_rgb(new_hue, s, v)
-    # Scale to 0-255
-    new_rgb = tuple(int(c * 255) for c in new_rgb)
-
-    return rgb_to_hex(new_rgb)
-
-
-def get_font_from_traits(traits):
-    """Select a font based on personality traits"""
-    extroversion = traits.get('extroversion', 0.5)
-    creativity = traits.get('creativity', 0.5)
-    analytical = traits.get('analytical', 0.5)
-
-    fonts = {
-        'creative_extrovert': {
-            'name': 'Playfair Display',
-            'description': 'Bold, expressive serif font reflecting creativity and confidence'
-        },
-        'creative_introvert': {
-            'name': 'Cormorant Garamond',
-            'description': 'Elegant, delicate serif font with artistic sensibility'
-        },
-        'analytical_extrovert': {
-            'name': 'Montserrat',
-            'description': 'Clean, strong sans-serif with precise character'
-        },
-        'analytical_introvert': {
-            'name': 'Inter',
-            'description': 'Focused, refined sans-serif designed for clarity'
-        },
-        'balanced': {
-            'name': 'Nunito',
-            'description': 'Balanced, versatile sans-serif with rounded terminals'
-        }
-    }
-
-    if creativity > 0.6 and extroversion > 0.6:
-        font_type = 'creative_extrovert'
-    elif creativity > 0.6 and extroversion <= 0.6:
-        font_type = 'creative_introvert'
-    elif analytical > 0.6 and extroversion > 0.6:
-        font_type = 'analytical_extrovert'
-    elif analytical > 0.6 and extroversion <= 0.6:
-        font_type = 'analytical_introvert'
-    else:
-        font_type = 'balanced'
-
-    return fonts[font_type]
-
-
-def get_layout_from_traits(traits):
-    """Determine layout style based on personality traits"""
-    extroversion = traits.get('extroversion', 0.5)
-    risk_taking = traits.get('risk_taking', 0.5)
-    empathy = traits.get('empathy', 0.5)
-
-    layouts = {
-        'bold': {
-            'name': 'Bold & Dynamic',
-            'description': 'Strong visual elements with high contrast and dynamic spacing'
-        },
-        'minimal': {
-            'name': 'Clean & Minimal',
-            'description': 'Elegant minimalism with focused content and precise spacing'
-        },
-        'balanced': {
-            'name': 'Harmonious & Balanced',
-            'description': 'Well-balanced layout with thoughtful spacing and moderation'
-        },
-        'warm': {
-            'name': 'Warm & Inviting',
-            'description': 'Welcoming layout with soft elements and approachable design'
-        },
-        'structured': {
-            'name': 'Structured & Organized',
-            'description': 'Structured layout with clear hierarchy and organization'
-        }
-    }
-
-    if extroversion > 0.7 and risk_taking > 0.7:
-        layout = 'bold'
-    elif extroversion < 0.4 and risk_taking < 0.4:
-        layout = 'minimal'
-    elif empathy > 0.7:
-        layout = 'warm'
-    elif risk_taking < 0.4 and extroversion > 0.6:
-        layout = 'structured'
-    else:
-        layout = 'balanced'
-
-    return layouts[layout]
+def upload_too_large():
+    """Whether an upload is over the size limit, reading at most the limit to find out.
 
-
-def generate_theme_explanation(theme, traits, ancestry):
-    """Create a human-readable explanation of the theme and why it was chosen"""
-    dominant_ancestry = max(ancestry.items(), key=lambda x: x[1])[0]
-    ancestry_readable = dominant_ancestry.replace('_', ' ').title()
-
-    if traits['extroversion'] > 0.7:
-        personality = "highly extroverted"
-    elif traits['extroversion'] < 0.3:
-        personality = "more introverted"
-    else:
-        personality = "balanced"
-
-    if traits['creativity'] > 0.7:
-        creativity = "very creative"
-    elif traits['creativity'] < 0.3:
-        creativity = "practical"
-    else:
-        creativity = "moderately creative"
-
-    if traits['analytical'] > 0.7:
-        analytical = "analytical"
+    A declared Content-Length is checked before anything is read. Chunked
+    uploads have none, so the limit is also applied while the multipart body
+    is parsed, which stops reading as soon as it is exceeded.
+    """
+    limit = app.config['MAX_PROFILE_SIZE'] + MULTIPART_OVERHEAD
+    request.max_content_length = limit
+    if request.content_length is not None and request.content_length > limit:
+        return True
+    try:
+        request.files
+    except RequestEntityTooLarge:
+        return True
+    return False
+
+
+def admitted(view):
+    """Run a view's POST requests under admission control"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        with admission.slot():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    message = "The server is busy, please try again in a moment."
+    if request.path.startswith('/api/'):
+        response = json_response({'error': message}, 503)
     else:
-        analytical = "intuitive"
-
-    explanation = f"""Your theme reflects your {personality} and {creativity} nature, with {ancestry_readable} 
-    ancestry influences. The {theme['colors']['primary']} primary color represents your {personality} 
-    tendencies, while the {theme['font']['name']} font was selected to complement your 
-    {creativity} and {analytical} traits. The {theme['layout']['name']} layout style 
-    brings everything together in a way that resonates with your unique personality profile."""
+        response = app.response_class(message, status=503, mimetype='text/plain')
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
-    return explanation
 
 @app.route("/", methods=["POST"])
+@admitted
 def generate_theme_route():
+    if upload_too_large():
+        flash("File is too large. Please upload a DNA JSON file under "
+              f"{app.config['MAX_PROFILE_SIZE'] // 1024} KB.", "error")
+        return redirect(url_for("index"))
     file = request.files.get("dna_file")
     if file and allowed_file(file.filename):
         try:
-            dna_data = json.load(file)  # Load the DNA data from the uploaded file
-            theme, explanation = generate_theme(dna_data)  # Pass dna_data to the function
-            if theme:
-                session['theme'] = theme
-                session['explanation'] = explanation
+            data = file.stream.read(app.config['MAX_PROFILE_SIZE'] + 1)
+            theme_id, name = request_flights.do(('store', hashlib.sha256(data).digest()),
+                                                store_upload, data)
+            if theme_id:
+                # Only the ID goes into the cookie, the theme stays server-side
+                session.pop('theme', None)
+                session.pop('explanation', None)
+                session['theme_id'] = theme_id
+                session['name'] = name or 'User'
                 return redirect(url_for('results'))
             else:
                 flash("Failed to generate theme. Please check your DNA file.", "error")
@@ -243,37 +148,88 @@ def generate_theme_route():
     else:
         flash("Invalid file. Please upload a valid DNA JSON file.", "error")
     return redirect(url_for("index"))
-@app.route("/", methods=["POST"])
+
+
+def theme_upload(data):
+    """Parse and theme an uploaded profile, returning (profile, theme, explanation)"""
+    with STAGE_LATENCY.time(stage='parse'):
+        profile = parse_profile(io.BytesIO(data), app.config['MAX_PROFILE_SIZE'])
+    with STAGE_LATENCY.time(stage='theme'):
+        theme, explanation = theme_cache.get_theme(profile.to_dna_data())
+    return profile, theme, explanation
+
+
+def store_upload(data):
+    """Theme and store an upload, returning (theme_id, name) or (None, None) on failure"""
+    profile, theme, explanation = theme_upload(data)
+    if not theme:
+        return None, None
+    theme_id = theme_store.put(theme, explanation)
+    similarity_index.add(theme_id, profile.traits, profile.ancestry)
+    return theme_id, profile.name
+
+
 def generate_theme(dna_data):
-    """Generate a theme based on the DNA data"""
+    """theme_logic.generate_theme, with failures counted for /metrics"""
     try:
-        # Process dna_data to extract traits, ancestry, etc.
-        traits = dna_data.get('personality_traits', {})
-        ancestry = dna_data.get('ancestry', {})
-
-        # Generate colors, font, and layout
-        colors = get_color_from_traits(traits, ancestry)
-        font = get_font_from_traits(traits)
-        layout = get_layout_from_traits(traits)
-
-        # Create the theme dictionary
-        theme = {
-            'colors': colors,
-            'font': font,
-            'layout': layout,
-            'bg_color': colors['primary'],
-            'accent_color': colors['accent'],
-            'font_name': font['name'],
-            'layout_style': layout['name'],
-        }
-
-        # Generate explanation
-        explanation = generate_theme_explanation(theme, traits, ancestry)
-        return theme, explanation
-
+        return build_theme(dna_data)
     except Exception as e:
+        THEME_FAILURES.inc(reason=type(e).__name__)
         print(f"Error generating theme: {e}")
         return None, None
+
+
+# Uploads and API requests beyond what the process can keep up with get a 503
+admission = AdmissionController(max_active=app.config['MAX_ACTIVE_REQUESTS'],
+                                max_queue=app.config['MAX_QUEUED_REQUESTS'],
+                                latency_budget=app.config['LATENCY_BUDGET_MS'] / 1000)
+
+# Identical uploads and API bodies arriving together are parsed, themed and
+# stored once, keyed on a hash of the raw body
+request_flights = SingleFlight()
+
+# Repeat uploads of the same profile skip theme generation entirely, and
+# identical profiles arriving together share one generation
+theme_cache = ThemeCache(max_size=10000, generate=generate_theme)
+
+# Generated themes are kept server-side, the session only holds their ID
+theme_store = create_store(app.config['THEME_STORE'], ttl=app.config['THEME_STORE_TTL'])
+
+page_cache = PageCache(max_size=app.config['PAGE_CACHE_SIZE'])
+TEMPLATES_DIR = os.path.join(app.root_path, app.template_folder)
+TEMPLATES_VERSION = templates_version(TEMPLATES_DIR, app.config['BUILD_ID'])
+
+# Design tokens per primary/accent/preferences combination, for ?tokens=1 API requests
+palette_cache = PaletteCache(max_size=10000)
+
+# Example themes are computed once at startup and served from memory
+examples_registry = ExamplesRegistry(app.config['EXAMPLES_DIR'],
+                                     check_interval=app.config['EXAMPLES_CHECK_INTERVAL'])
+examples_registry.refresh()
+
+
+def load_similarity_index(path):
+    """Similar-themes index bounded like the theme store, restored from path if it exists"""
+    max_size = app.config['SIMILARITY_MAX_SIZE']
+    store_size = getattr(theme_store, 'max_size', None)
+    if store_size is not None:
+        max_size = min(max_size, store_size)
+    ttl = app.config['THEME_STORE_TTL']
+    if path and os.path.exists(path):
+        try:
+            return SimilarityIndex.restore(path, max_size, ttl)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring similarity snapshot {path}: {e}")
+    return SimilarityIndex(max_size, ttl)
+
+
+# Uploaded profiles' traits, for /results/similar. Each worker process has its
+# own index, and their saves are merged so no worker's inserts are lost.
+similarity_index = load_similarity_index(app.config['SIMILARITY_SNAPSHOT'])
+if app.config['SIMILARITY_SNAPSHOT']:
+    atexit.register(similarity_index.snapshot, app.config['SIMILARITY_SNAPSHOT'], merge=True)
+
+
 def mock_theme():
     primary = request.args.get("primary", "#ffffff")
     accent = request.args.get("accent", "#000000")
@@ -282,29 +238,42 @@ def mock_theme():
     return render_template("mock_theme.html", primary=primary, accent=accent, font=font, layout=layout)
 
 @app.route("/", methods=["GET", "POST"])
-
+@admitted
 def index():
     theme = None
     explanation = ""
-    if request.method == "POST":
+    if request.method == "POST" and upload_too_large():
+        flash("File is too large. Please upload a DNA JSON file under "
+              f"{app.config['MAX_PROFILE_SIZE'] // 1024} KB.", "error")
+    elif request.method == "POST":
         file = request.files.get("dna_file")
         if file and allowed_file(file.filename):
             try:
-                dna_data = json.load(file)
+                data = file.stream.read(app.config['MAX_PROFILE_SIZE'] + 1)
                 # generate_theme now returns both theme and explanation
-                theme, explanation = generate_theme(dna_data)
+                _, theme, explanation = request_flights.do(
+                    ('theme', hashlib.sha256(data).digest()), theme_upload, data)
                 if not theme:
                     flash("Failed to generate theme. Please check your DNA file.", "error")
             except Exception as e:
                 flash(f"Error processing file: {e}", "error")
         else:
             flash("Invalid file. Please upload a valid DNA JSON file.", "error")
+    if request.method == "GET" and '_flashes' not in session:
+        # Nothing user-specific to show, so the page is the same for everyone
+        return render_cached("index.html", 'public, no-cache', theme=theme, explanation=explanation)
     return render_template("index.html", theme=theme, explanation=explanation)
  
 @app.route('/results')
 def results():
-    theme = session.get('theme')
-    explanation = session.get('explanation')
+    stored = None
+    if 'theme_id' in session:
+        stored = theme_store.get(session['theme_id'])
+    if stored:
+        theme, explanation = stored
+    else:
+        theme = session.get('theme')
+        explanation = session.get('explanation')
     name = session.get('name', 'User')
 
     if not theme:
@@ -326,35 +295,397 @@ def results():
     if 'font_name' not in theme:
         theme['font_name'] = theme['font']['name']
 
-    return render_template('results.html', theme=theme, explanation=explanation, name=name)
+    theme_css_url = None
+    if app.config['SPLIT_THEME_CSS'] and valid_theme_css(theme):
+        theme_css_url = url_for('theme_asset', name=write_theme_css(theme))
+
+    return render_cached('results.html', 'private, no-cache', theme=theme,
+                         explanation=explanation, name=name, theme_css_url=theme_css_url)
+
+
+@app.route('/results/similar')
+def similar_results():
+    """Themes of the uploaded profiles closest to the current one, as JSON"""
+    theme_id = session.get('theme_id')
+    if not theme_id:
+        return json_response({'error': 'No theme data found. Please upload your DNA file first.'}, 404)
+    try:
+        k = int(request.args.get('k', 5))
+    except ValueError:
+        return json_response({'error': 'k must be an integer'}, 400)
+    k = max(1, min(k, app.config['MAX_SIMILAR']))
+
+    with STAGE_LATENCY.time(stage='similar'):
+        similar = live_neighbors(theme_id, k)
+    response = json_response({'similar': similar})
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def live_neighbors(theme_id, k):
+    """Up to k nearest themes that are still in the theme store, nearest first.
+
+    Neighbors whose theme has left the store are removed from the index and
+    the query repeated, so expired entries never shorten the result.
+    """
+    themes = {}
+    while True:
+        neighbors = similarity_index.neighbors(theme_id, k)
+        expired = False
+        for _, key in neighbors:
+            if key in themes:
+                continue
+            stored = theme_store.get(key)
+            if stored is None:
+                similarity_index.remove(key)
+                expired = True
+            else:
+                themes[key] = stored[0]
+        if not expired or len(neighbors) < k:
+            return [{'theme_id': key, 'distance': round(distance, 4), 'theme': themes[key]}
+                    for distance, key in neighbors if key in themes]
+
+
+def render_cached(template, cache_control, **context):
+    """Render a template through the page cache, answering revalidations with 304"""
+    version = TEMPLATES_VERSION
+    if app.jinja_env.auto_reload:
+        # Templates can change under a running debug server
+        version = templates_version(TEMPLATES_DIR, app.config['BUILD_ID'])
+    key = fingerprint(template, context, version)
+    gzipped = 'gzip' in request.accept_encodings
+    # Each content-coding gets its own strong ETag, but a tag for either
+    # coding shows the client already has this page
+    etag = key + '-gz' if gzipped else key
+    if key in request.if_none_match or key + '-gz' in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        page = page_cache.get(key)
+        if page is None:
+            page = page_cache.put(key, render_template(template, **context))
+        response = app.response_class(mimetype='text/html')
+        if gzipped:
+            response.set_data(page.gzipped)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(page.body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Cookie')
+    return response
+
+
+FONT_NAME = re.compile(r'^[A-Za-z0-9 ]{1,64}$')
+THEME_ASSET_NAME = re.compile(r'^theme-[0-9a-f]{16}\.css$')
+
+
+def valid_theme_css(theme):
+    """Whether a theme's CSS values are safe to write into a stylesheet"""
+    return bool(is_hex_color(theme['colors'].get('primary'))
+                and is_hex_color(theme['colors'].get('accent'))
+                and FONT_NAME.match(str(theme.get('font_name'))))
+
+
+@app.route('/theme-assets/<name>')
+def theme_asset(name):
+    """Serve a content-hashed theme stylesheet, precompressed when possible"""
+    if not THEME_ASSET_NAME.match(name):
+        return app.response_class('Not found', status=404, mimetype='text/plain')
+    path = os.path.join(THEME_CSS_DIR, name)
+    if not os.path.exists(path):
+        return app.response_class('Not found', status=404, mimetype='text/plain')
+
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in request.accept_encodings and os.path.exists(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+    with open(path, 'rb') as f:
+        response = app.response_class(f.read(), mimetype='text/css')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 
 @app.route('/examples')
 def examples():
-    example_themes = []
-    example_dna_files = [
-        'example1.json',
-        'example2.json',
-        'example3.json',
-        'example4.json',
-        'example5.json'
-    ]
-
-    for file in example_dna_files:
+    return render_cached('examples.html', 'public, max-age=60',
+                         examples=examples_registry.examples())
+
+
+class BodyTooLarge(ValueError):
+    """Raised for request bodies over API_MAX_BODY_SIZE, before or after decoding"""
+
+
+def read_body():
+    """Read the raw request body, raising BodyTooLarge past API_MAX_BODY_SIZE"""
+    max_size = app.config['API_MAX_BODY_SIZE']
+    if request.content_length is not None and request.content_length > max_size:
+        raise BodyTooLarge("Request body is too large")
+    # Chunked requests have no Content-Length, so never read past the limit
+    body = request.stream.read(max_size + 1)
+    if len(body) > max_size:
+        raise BodyTooLarge("Request body is too large")
+    return body
+
+
+def parse_json_body(body):
+    """Parse a raw request body as JSON, inflating gzip-encoded bodies"""
+    max_size = app.config['API_MAX_BODY_SIZE']
+    encoding = request.headers.get('Content-Encoding', '').lower()
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
         try:
-            with open(os.path.join('examples', file), 'r') as f:
-                dna_data = json.load(f)
-                theme, explanation = generate_theme(dna_data)
-                if theme:
-                    example_themes.append({
-                        'name': dna_data.get('name', 'Example User'),
-                        'theme': theme,
-                        'explanation': explanation
-                    })
-        except Exception as e:
-            print(f"Error loading example {file}: {e}")
+            body = decompressor.decompress(body, max_size)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip data: {e}")
+        if decompressor.unconsumed_tail:
+            raise BodyTooLarge("Request body is too large")
+    elif encoding not in ('', 'identity'):
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    return decode(body)
+
+
+def coalesced_response(build):
+    """JSON response for build(body), shared by concurrent requests with the same body.
+
+    The key covers the path, query string and Content-Encoding as well as a
+    hash of the raw body, so only requests that would get the same answer
+    share one. Parsing, theming and tokens all happen once.
+    """
+    try:
+        body = read_body()
+    except BodyTooLarge as e:
+        return json_response({'error': str(e)}, 413)
+    key = (request.path, request.query_string, request.headers.get('Content-Encoding', '').lower(),
+           hashlib.sha256(body).digest())
+    return json_response(*request_flights.do(key, build, body))
+
+
+def json_response(payload, status=200):
+    """Build a JSON response, gzip-compressed when the client accepts it"""
+    body = json.dumps(payload).encode('utf-8')
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= 1024 and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def theme_result(theme, explanation):
+    if not theme:
+        return {'error': 'Failed to generate theme. Please check your DNA data.'}
+    return {'theme': theme, 'explanation': explanation}
+
+
+def explanation_locale():
+    """Locale requested with ?locale=, raising ValueError for unknown ones"""
+    locale = request.args.get('locale', 'en')
+    if locale not in EXPLANATION_TEMPLATES:
+        raise ValueError(f"Unknown locale {locale!r}, expected one of "
+                         f"{', '.join(sorted(EXPLANATION_TEMPLATES))}")
+    return locale
+
+
+def wants_tokens():
+    return request.args.get('tokens') == '1'
+
+
+def add_tokens(results, profiles):
+    """Attach palette design tokens to successful results, computing misses in one pass"""
+    themed = [(result, profile) for result, profile in zip(results, profiles) if 'theme' in result]
+    with STAGE_LATENCY.time(stage='palette'):
+        tokens = palette_cache.get_tokens_batch([
+            (result['theme']['colors']['primary'], result['theme']['colors']['accent'],
+             profile.color_preferences)
+            for result, profile in themed
+        ])
+    for (result, _), result_tokens in zip(themed, tokens):
+        result['tokens'] = result_tokens
+
+
+@app.route('/api/v1/theme', methods=['POST'])
+@admitted
+def api_theme():
+    return coalesced_response(build_theme_result)
+
+
+def build_theme_result(body):
+    """(payload, status) for a single-profile request body"""
+    try:
+        dna_data = parse_json_body(body)
+    except BodyTooLarge as e:
+        return {'error': str(e)}, 413
+    except ValueError as e:
+        return {'error': f"Invalid request body: {e}"}, 400
+    try:
+        profile = validate_profile(dna_data)
+        locale = explanation_locale()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    with STAGE_LATENCY.time(stage='theme'):
+        result = theme_result(*theme_cache.get_theme(profile.to_dna_data()))
+    if locale != 'en' and 'theme' in result:
+        result['explanation'] = render_explanation(result['theme'], profile.traits,
+                                                   profile.ancestry, locale)
+    if wants_tokens():
+        add_tokens([result], [profile])
+    return result, 422 if 'error' in result else 200
+
+
+@app.route('/api/v1/themes:batch', methods=['POST'])
+@admitted
+def api_themes_batch():
+    return coalesced_response(build_batch_results)
+
+
+def build_batch_results(body):
+    """(payload, status) for a batch request body"""
+    try:
+        profiles = parse_json_body(body)
+    except BodyTooLarge as e:
+        return {'error': str(e)}, 413
+    except ValueError as e:
+        return {'error': f"Invalid request body: {e}"}, 400
+    try:
+        locale = explanation_locale()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if isinstance(profiles, dict):
+        profiles = profiles.get('profiles')
+    if not isinstance(profiles, list):
+        return {'error': 'Expected an array of DNA profile objects'}, 400
+    if len(profiles) > app.config['API_MAX_BATCH_SIZE']:
+        return {'error': f"At most {app.config['API_MAX_BATCH_SIZE']} profiles per request"}, 413
+
+    checked = []
+    for dna_data in profiles:
+        try:
+            checked.append(validate_profile(dna_data))
+        except ProfileError as e:
+            checked.append(e)
+
+    valid = [profile for profile in checked if not isinstance(profile, ProfileError)]
+    with STAGE_LATENCY.time(stage='theme_batch'):
+        themes = iter(generate_themes_batch([profile.to_dna_data() for profile in valid], locale))
+    results = []
+    for profile in checked:
+        if isinstance(profile, ProfileError):
+            results.append({'error': str(profile)})
+        else:
+            results.append(theme_result(*next(themes)))
+    if wants_tokens():
+        add_tokens(results, checked)
+    return {'results': results}, 200
+
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions with serialization time recorded as a stage"""
+
+    def save_session(self, app, session, response):
+        with STAGE_LATENCY.time(stage='session'):
+            super().save_session(app, session, response)
+
+
+app.session_interface = TimedSessionInterface()
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    if request.content_length:
+        UPLOAD_SIZE.observe(request.content_length, route=request_route())
+
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def request_route():
+    """Route label for the current request, without unbounded raw paths"""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def record_request_metrics(sender, response, **extra):
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route=request_route(),
+                                method=request.method, status=response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        name = f"{request.endpoint or 'unmatched'}-{time.time():.6f}.prof"
+        profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+
+
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+
+def record_render_time(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage='render')
+
+
+request_finished.connect(record_request_metrics, app)
+before_render_template.connect(start_render_timer, app)
+template_rendered.connect(record_render_time, app)
+
+
+def theme_cache_metrics():
+    stats = theme_cache.stats()
+    yield 'traitify_theme_cache_size', 'gauge', 'Themes held in the cache', {(): stats['size']}
+    for counter in ('hits', 'misses', 'evictions', 'expirations'):
+        yield (f"traitify_theme_cache_{counter}_total", 'counter',
+               f"Theme cache {counter}", {(): stats[counter]})
+    yield ('traitify_theme_cache_coalesced_total', 'counter',
+           'Theme requests that waited for an identical generation already running',
+           {(): stats['coalesced']})
+    yield ('traitify_theme_generations_in_flight', 'gauge', 'Themes being generated',
+           {(): stats['in_flight']})
+    yield 'traitify_page_cache_hits_total', 'counter', 'Page cache hits', {(): page_cache.hits}
+    yield 'traitify_page_cache_misses_total', 'counter', 'Page cache misses', {(): page_cache.misses}
+    yield 'traitify_palette_cache_hits_total', 'counter', 'Palette cache hits', {(): palette_cache.hits}
+    yield ('traitify_palette_cache_misses_total', 'counter', 'Palette cache misses',
+           {(): palette_cache.misses})
+    yield ('traitify_similarity_index_size', 'gauge', 'Profiles in the similar-themes index',
+           {(): len(similarity_index)})
+
+
+REGISTRY.add_collector(theme_cache_metrics)
+
+
+def admission_metrics():
+    stats = admission.stats()
+    yield 'traitify_requests_active', 'gauge', 'Requests holding an admission slot', {(): stats['active']}
+    yield 'traitify_requests_waiting', 'gauge', 'Requests queued for an admission slot', {(): stats['waiting']}
+    yield ('traitify_requests_admitted_total', 'counter', 'Requests given an admission slot',
+           {(): stats['admitted']})
+    yield ('traitify_requests_shed_total', 'counter', 'Requests turned away with a 503',
+           {(('reason', reason),): count for reason, count in stats['shed'].items()})
+    flights = request_flights.stats()
+    yield ('traitify_requests_coalesced_total', 'counter',
+           'Uploads and API requests that shared an identical request already running',
+           {(): flights['coalesced']})
+    yield ('traitify_requests_in_flight', 'gauge', 'Distinct uploads and API bodies being processed',
+           {(): flights['in_flight']})
+
+
+REGISTRY.add_collector(admission_metrics)
+
 
-    return render_template('examples.html', examples=example_themes)
+@app.route('/metrics')
+def metrics():
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
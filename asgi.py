@@ -0,0 +1,156 @@
+"""ASGI entry point for the Flask app.
+
+Request bodies are read on the event loop, so a slow upload only holds a
+buffer rather than a worker thread. Once the whole body has arrived, the
+request is dispatched to the existing Flask routes on a thread pool, which
+is where upload parsing, theme generation and template rendering run.
+
+    uvicorn asgi:application --workers 4
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker -w 4
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+
+# Threads running Flask per worker process, and the largest body accepted,
+# which is the app's own API limit (TRAITIFY_MAX_BODY_SIZE)
+THREADS = int(os.environ.get('TRAITIFY_ASGI_THREADS', 32))
+MAX_BODY_SIZE = app.config['API_MAX_BODY_SIZE']
+
+# Returned by read_body when the client went away before sending everything
+DISCONNECTED = object()
+
+
+class WsgiBridge:
+    """Serve a WSGI app over ASGI with fully buffered request bodies"""
+
+    def __init__(self, wsgi_app, threads=THREADS, max_body_size=MAX_BODY_SIZE):
+        self.wsgi_app = wsgi_app
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='traitify')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']}")
+
+        body = await self.read_body(receive)
+        if body is DISCONNECTED:
+            # Nobody is left to answer, and a truncated body must not reach the app
+            return
+        if body is None:
+            await send_simple(send, 413, b'Request body is too large')
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self.call_wsgi, environ)
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Collect the request body.
+
+        Returns None once it exceeds the limit, and DISCONNECTED if the client
+        disconnects before the body is complete.
+        """
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return DISCONNECTED
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_size:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def call_wsgi(self, environ):
+        """Run the WSGI app to completion on a worker thread"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope and buffered body into a WSGI environ"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = 'HTTP_' + name
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+    return environ
+
+
+async def send_simple(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8'),
+                    (b'content-length', str(len(body)).encode('latin-1'))]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+application = WsgiBridge(app)
@@ -0,0 +1,263 @@
+"""Benchmarks for theme generation and the Flask request path.
+
+    python benchmark.py                          # run everything, print a table
+    python benchmark.py -o bench.json            # also save machine-readable results
+    python benchmark.py --compare baseline.json  # flag regressions against a saved run
+    python benchmark.py --filter http            # only benchmarks whose name contains 'http'
+    python benchmark.py --import-budget-ms 50    # fail if theme_logic imports slower, or pulls in Flask
+
+Timings are the best of several repeats, reported per operation.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import theme_logic
+from synthetic import make_profiles
+
+SIZES = (1, 100, 10000)
+
+# Modules the theme engine must not pull in, so workers start without the web stack
+WEB_MODULES = ('flask', 'werkzeug', 'jinja2')
+
+IMPORT_PROBE = """
+import sys, time
+started = time.perf_counter()
+import theme_logic
+elapsed = time.perf_counter() - started
+loaded = sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[1:]))
+print(elapsed, ' '.join(loaded))
+"""
+
+
+def measure(func, number, repeat):
+    """Return (best, median) seconds per call of func"""
+    timings = timeit.repeat(func, number=number, repeat=repeat)
+    return min(timings) / number, statistics.median(timings) / number
+
+
+def theme_logic_benchmarks(profiles, wanted):
+    """Yield (name, func, ops) for the per-function theme_logic hot path"""
+    dna_data = profiles[0]
+    traits = dna_data['personality_traits']
+    ancestry = dna_data['ancestry']
+    theme, _ = theme_logic.generate_theme(dna_data)
+    primary_rgb = theme_logic.hex_to_rgb(theme['colors']['primary'])
+
+    yield 'theme_logic.hex_to_rgb', lambda: theme_logic.hex_to_rgb('#89d250'), 1
+    yield 'theme_logic.rgb_to_hex', lambda: theme_logic.rgb_to_hex((137, 210, 80)), 1
+    yield ('theme_logic.generate_accent_color',
+           lambda: theme_logic.generate_accent_color(primary_rgb, ancestry), 1)
+    yield 'theme_logic.get_color_from_traits', lambda: theme_logic.get_color_from_traits(traits, ancestry), 1
+    yield 'theme_logic.get_font_from_traits', lambda: theme_logic.get_font_from_traits(traits), 1
+    yield 'theme_logic.get_layout_from_traits', lambda: theme_logic.get_layout_from_traits(traits), 1
+    yield ('theme_logic.generate_theme_explanation',
+           lambda: theme_logic.generate_theme_explanation(theme, traits, ancestry), 1)
+
+    for size in SIZES:
+        batch = profiles[:size]
+        yield (f"theme_logic.generate_theme[{size}]",
+               lambda batch=batch: [theme_logic.generate_theme(p) for p in batch], size)
+
+
+def batch_benchmarks(profiles, wanted):
+    """Yield (name, func, ops) for the vectorized engine, if NumPy is available"""
+    if not any(wanted(f"theme_batch.generate_themes_batch[{size}]") for size in SIZES):
+        return
+    try:
+        from theme_batch import generate_themes_batch
+    except ImportError:
+        return
+    for size in SIZES:
+        batch = profiles[:size]
+        yield (f"theme_batch.generate_themes_batch[{size}]",
+               lambda batch=batch: generate_themes_batch(batch), size)
+
+
+GENOTYPE_BENCHMARKS = ('genotype.read_markers[find]', 'genotype.read_markers[scan]',
+                       'genotype.scan_markers[stream]')
+
+
+def genotype_benchmarks(profiles, wanted):
+    """Yield (name, func, ops) for raw genotype ingestion, per SNP row of a synthetic export"""
+    # Writing the synthetic export is slow, so skip it unless a benchmark needs it
+    if not any(map(wanted, GENOTYPE_BENCHMARKS)):
+        return
+    import genotype
+    from synthetic import MARKERS, write_genotype_file
+
+    rows = 600000
+    directory = tempfile.mkdtemp(prefix='traitify-bench-')
+    path = os.path.join(directory, 'genome.txt')
+    write_genotype_file(path, rows)
+    few = genotype.MarkerIndex(MARKERS)
+    many = genotype.MarkerIndex(list(MARKERS) + [f"rs{i}" for i in range(genotype.FIND_LIMIT)])
+
+    def stream():
+        with open(path, 'rb') as f:
+            genotype.scan_markers(f, few)
+
+    try:
+        yield 'genotype.read_markers[find]', lambda: genotype.read_markers(path, few), rows
+        yield 'genotype.read_markers[scan]', lambda: genotype.read_markers(path, many), rows
+        yield 'genotype.scan_markers[stream]', stream, rows
+    finally:
+        shutil.rmtree(directory)
+
+
+HTTP_BENCHMARKS = ('http.upload_results', 'http.index', 'http.api_theme')
+
+
+def http_benchmarks(profiles, wanted):
+    """Yield (name, func, ops) for requests through Flask's test client"""
+    # Importing the app creates its theme store and uploads folder
+    if not any(map(wanted, HTTP_BENCHMARKS)):
+        return
+    import app as web
+
+    client = web.app.test_client()
+    uploads = [json.dumps(p).encode('utf-8') for p in profiles[:100]]
+    position = [0]
+
+    def upload_and_results():
+        # Clear the theme cache so every upload does the full work
+        web.theme_cache.clear()
+        data = uploads[position[0] % len(uploads)]
+        position[0] += 1
+        client.post('/', data={'dna_file': (io.BytesIO(data), 'dna.json')},
+                    content_type='multipart/form-data')
+        client.get('/results')
+
+    def index():
+        # Clear the page cache so every request renders index.html
+        web.page_cache.clear()
+        client.get('/')
+
+    yield 'http.upload_results', upload_and_results, 1
+    yield 'http.index', index, 1
+    yield ('http.api_theme',
+           lambda: client.post('/api/v1/theme', data=uploads[0], content_type='application/json'), 1)
+
+
+def measure_import(repeat=5):
+    """Return (best cold import seconds of theme_logic, web modules it loaded).
+
+    The probe runs from the repository root, wherever benchmark.py is run from,
+    and raises RuntimeError with its stderr if the import fails.
+    """
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        probe = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE, *WEB_MODULES],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if probe.returncode != 0:
+            raise RuntimeError(f"Importing theme_logic failed:\n{probe.stderr.strip()}")
+        output = probe.stdout.split()
+        timings.append(float(output[0]))
+        loaded.update(output[1:])
+    return min(timings), sorted(loaded)
+
+
+def run(name_filter=None, repeat=5, min_time=0.2):
+    """Run all benchmarks and return {name: result} in microseconds per op"""
+    profiles = make_profiles(max(SIZES))
+    groups = [theme_logic_benchmarks, batch_benchmarks, genotype_benchmarks, http_benchmarks]
+
+    def wanted(name):
+        return not name_filter or name_filter in name
+
+    results = {}
+    for group in groups:
+        for name, func, ops in group(profiles, wanted):
+            if not wanted(name):
+                continue
+            # Calibrate so one repeat takes roughly min_time
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            number = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+
+            best, median = measure(func, number, repeat)
+            results[name] = {
+                'best_us': best / ops * 1e6,
+                'median_us': median / ops * 1e6,
+                'ops_per_sec': ops / best if best else None,
+                'ops': ops,
+                'calls': number * repeat
+            }
+            print(f"{name:50} {results[name]['best_us']:12.2f} us/op", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return [(name, old, new, ratio)] for benchmarks slower than threshold"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ratio = result['best_us'] / old['best_us']
+        if ratio > threshold:
+            regressions.append((name, old['best_us'], result['best_us'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark theme generation and the Flask request path")
+    parser.add_argument('-o', '--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help="slowdown ratio reported as a regression (default: 1.10)")
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float,
+                        help="only check that a cold theme_logic import stays under this budget")
+    args = parser.parse_args(argv)
+
+    if args.import_budget_ms is not None:
+        try:
+            elapsed, loaded = measure_import(args.repeat)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print(f"theme_logic cold import: {elapsed * 1000:.1f} ms "
+              f"(budget {args.import_budget_ms:.1f} ms)")
+        if loaded:
+            print(f"theme_logic imports web modules: {', '.join(loaded)}")
+        return 1 if loaded or elapsed * 1000 > args.import_budget_ms else 0
+
+    results = run(args.filter, args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} us/op ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Generate themes for a JSONL file of DNA profiles.
+
+Reads one profile per line (same shape as examples/sample1.json), and writes
+one JSON line per input line holding either the theme, explanation and
+rule_version, or the error that prevented generating it. Input is processed
+in fixed-size chunks, so memory use does not grow with the file size.
+
+    python bulk_themes.py profiles.jsonl -o themes.jsonl
+    python bulk_themes.py profiles.jsonl -o themes.jsonl --workers 0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+from profile_parser import ProfileError, decode
+from theme_logic import RULE_VERSION, RULES, build_theme
+
+
+def numbered_lines(lines):
+    """Yield (line_number, line) for each non-blank input line"""
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def read_records(numbered):
+    """Yield (line_number, dna_data, error) for each numbered input line.
+
+    Lines should be bytes, so that invalid UTF-8 is reported for its own
+    line instead of stopping the file iterator.
+    """
+    for line_number, line in numbered:
+        try:
+            dna_data = decode(line)
+        except ProfileError as e:
+            yield line_number, None, str(e)
+            continue
+        if not isinstance(dna_data, dict):
+            yield line_number, None, "Profile must be a JSON object"
+            continue
+        yield line_number, dna_data, None
+
+
+def theme_record(line_number, dna_data, rules=RULES, version=RULE_VERSION):
+    """Build the output record for one profile"""
+    record = {'line': line_number, 'user_id': dna_data.get('user_id')}
+    try:
+        theme, explanation = build_theme(dna_data, rules)
+    except Exception as e:
+        record['error'] = f"Error generating theme: {e}"
+        return record
+    record['theme'] = theme
+    record['explanation'] = explanation
+    record['rule_version'] = version
+    return record
+
+
+def theme_chunk(chunk):
+    """Build output records for a chunk of read_records() items"""
+    records = []
+    for line_number, dna_data, error in chunk:
+        if error:
+            records.append({'line': line_number, 'error': error})
+        else:
+            records.append(theme_record(line_number, dna_data))
+    return records
+
+
+def batch_theme_chunk(chunk):
+    """Like theme_chunk, but themes valid profiles with the vectorized engine"""
+    from theme_batch import generate_themes_batch
+
+    valid = [(line_number, dna_data) for line_number, dna_data, error in chunk if not error]
+    themes = iter(generate_themes_batch([dna_data for _, dna_data in valid]))
+
+    records = []
+    for line_number, dna_data, error in chunk:
+        if error:
+            records.append({'line': line_number, 'error': error})
+            continue
+        theme, explanation = next(themes)
+        if theme is None:
+            # Re-run the failed profile on the scalar path to get its error
+            records.append(theme_record(line_number, dna_data))
+            continue
+        records.append({
+            'line': line_number,
+            'user_id': dna_data.get('user_id'),
+            'theme': theme,
+            'explanation': explanation,
+            'rule_version': RULE_VERSION
+        })
+    return records
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@lru_cache(maxsize=None)
+def palette_cache():
+    """PaletteCache shared by every chunk rendered in this process"""
+    from palette import PaletteCache
+    return PaletteCache()
+
+
+def add_tokens(records, chunk):
+    """Attach palette design tokens to the themed records of a chunk.
+
+    Themes whose colors are not '#rrggbb' (from out-of-range traits) are
+    left without tokens rather than failing the chunk.
+    """
+    from palette import is_hex_color
+
+    themed = [(record, dna_data) for record, (_, dna_data, _) in zip(records, chunk)
+              if 'theme' in record and is_hex_color(record['theme']['colors']['primary'])
+              and is_hex_color(record['theme']['colors']['accent'])]
+    tokens = palette_cache().get_tokens_batch([
+        (record['theme']['colors']['primary'], record['theme']['colors']['accent'],
+         dna_data.get('color_preferences'))
+        for record, dna_data in themed
+    ])
+    for (record, _), record_tokens in zip(themed, tokens):
+        record['tokens'] = record_tokens
+
+
+def render_chunk(numbered, engine='batch', tokens=False):
+    """Parse, theme and serialize a chunk of numbered input lines.
+
+    Returns (text, count, failed) so that process pool workers send back a
+    single string per chunk rather than many small objects.
+    """
+    handler = batch_theme_chunk if engine == 'batch' else theme_chunk
+    chunk = list(read_records(numbered))
+    records = handler(chunk)
+    if tokens:
+        add_tokens(records, chunk)
+    failed = sum(1 for record in records if 'error' in record)
+    text = ''.join(json.dumps(record) + '\n' for record in records)
+    return text, len(records), failed
+
+
+def process_chunks(chunks, engine='batch', workers=1, tokens=False):
+    """Yield render_chunk() results for each chunk, in input order.
+
+    With more than one worker, chunks are sharded across a process pool.
+    Only a few chunks per worker are in flight at a time, so memory stays
+    bounded however long the input is.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield render_chunk(chunk, engine, tokens)
+        return
+
+    max_pending = workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            pending.append(executor.submit(render_chunk, chunk, engine, tokens))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(infile, outfile, chunk_size=1000, progress_every=100000, engine='batch',
+        workers=1, progress=sys.stderr, tokens=False):
+    """Stream profiles from infile to theme records in outfile.
+
+    Returns a (total, failed) tuple of record counts.
+    """
+    total = failed = 0
+    next_report = progress_every
+    started = time.monotonic()
+
+    chunks = chunked(numbered_lines(infile), chunk_size)
+    for text, count, chunk_failed in process_chunks(chunks, engine, workers, tokens):
+        outfile.write(text)
+        total += count
+        failed += chunk_failed
+
+        if progress_every and total >= next_report:
+            elapsed = time.monotonic() - started
+            print(f"{total} profiles, {failed} failed, "
+                  f"{total / elapsed if elapsed else 0:.0f}/s", file=progress)
+            next_report = (total // progress_every + 1) * progress_every
+
+    elapsed = time.monotonic() - started
+    print(f"Done: {total} profiles, {failed} failed in {elapsed:.1f}s", file=progress)
+    return total, failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate themes for a JSONL file of DNA profiles")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="input JSONL file, '-' for stdin (default)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output JSONL file, '-' for stdout (default)")
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help="profiles processed per chunk (default: 1000)")
+    parser.add_argument('--progress-every', type=int, default=100000,
+                        help="report progress every N profiles, 0 to disable (default: 100000)")
+    parser.add_argument('--engine', choices=['batch', 'scalar'], default='batch',
+                        help="vectorized batch engine or one generate_theme call per profile")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="worker processes, 0 for one per CPU (default: 1)")
+    parser.add_argument('--tokens', action='store_true',
+                        help="add palette design tokens (see palette.py) to each theme")
+    parser.add_argument('--fail-on-error', action='store_true',
+                        help="exit with status 1 if any profile failed")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.chunk_size < 1:
+        print("--chunk-size must be at least 1", file=sys.stderr)
+        return 2
+    workers = args.workers or os.cpu_count() or 1
+
+    infile = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        _, failed = run(infile, outfile, args.chunk_size, args.progress_every, args.engine,
+                        workers, tokens=args.tokens)
+    finally:
+        if infile is not sys.stdin.buffer:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    return 1 if failed and args.fail_on_error else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""In-memory gallery of the example DNA profiles shipped in examples/.
+
+Profiles are parsed and themed once, when the registry is first refreshed.
+After that the directory is rescanned at most every check_interval seconds,
+and only files whose modification time or size changed are read again.
+"""
+import os
+import threading
+import time
+
+from profile_parser import parse_profile
+from theme_logic import build_theme
+
+
+class ExamplesRegistry:
+    """Precomputed themes for the *.json profiles in a directory"""
+
+    def __init__(self, directory, check_interval=2.0, generate=build_theme):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.generate = generate
+        # Bumped whenever the set of examples changes
+        self.version = 0
+        self._entries = {}
+        self._examples = []
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _load(self, path):
+        """Theme one example file, returning its gallery entry or None"""
+        try:
+            with open(path, 'rb') as f:
+                profile = parse_profile(f)
+            theme, explanation = self.generate(profile.to_dna_data())
+        except Exception as e:
+            print(f"Error loading example {path}: {e}")
+            return None
+        return {
+            'name': profile.name or 'Example User',
+            'theme': theme,
+            'explanation': explanation
+        }
+
+    def refresh(self):
+        """Rescan the directory, reloading changed files. Returns whether anything changed."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                found = {
+                    entry.name: entry.stat()
+                    for entry in os.scandir(self.directory)
+                    if entry.name.endswith('.json') and entry.is_file()
+                }
+            except FileNotFoundError:
+                found = {}
+
+            changed = set(self._entries) - set(found)
+            for name in changed:
+                del self._entries[name]
+            for name, stat in found.items():
+                signature = (stat.st_mtime_ns, stat.st_size)
+                cached = self._entries.get(name)
+                if cached is None or cached[0] != signature:
+                    self._entries[name] = (signature, self._load(os.path.join(self.directory, name)))
+                    changed.add(name)
+
+            if changed:
+                self._examples = [
+                    example for _, (_, example) in sorted(self._entries.items())
+                    if example is not None
+                ]
+                self.version += 1
+            return bool(changed)
+
+    def examples(self):
+        """Gallery entries sorted by file name, refreshed if the check interval has passed"""
+        if self._checked is None or time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+        return self._examples
+
+    def __len__(self):
+        return len(self._examples)
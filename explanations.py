@@ -0,0 +1,177 @@
+"""Precompiled theme explanation text.
+
+An explanation only varies with three trait buckets, the dominant ancestry,
+and the theme's primary color, font and layout names. For each bucket
+combination the template is compiled once into four fixed text fragments
+around the three theme fields, so rendering is a single join.
+
+Templates are registered per locale or variant name; 'en' is the text
+generate_theme_explanation has always produced.
+"""
+import string
+from functools import lru_cache
+
+from theme_logic import dominant_ancestry
+
+# Fields filled in for every theme, everything else is fixed per bucket
+THEME_FIELDS = ('primary', 'font', 'layout')
+
+
+class ExplanationTemplate:
+    """Explanation text for one locale or variant.
+
+    text is a str.format template using {personality}, {creativity},
+    {analytical}, {ancestry} and each of the THEME_FIELDS exactly once, in
+    any order. The label dicts map the bucket names 'high', 'low' and 'mid'
+    to the words used for them.
+    """
+
+    def __init__(self, text, personality, creativity, analytical, mixed_ancestry='Mixed'):
+        self.text = text
+        self.personality = personality
+        self.creativity = creativity
+        self.analytical = analytical
+        self.mixed_ancestry = mixed_ancestry
+
+
+EN_LABELS = {
+    'personality': {'high': "highly extroverted", 'low': "more introverted", 'mid': "balanced"},
+    'creativity': {'high': "very creative", 'low': "practical", 'mid': "moderately creative"},
+    'analytical': {'high': "analytical", 'mid': "intuitive"}
+}
+
+# Kept byte for byte, including the spaces before each line break and the indentation
+EN_TEXT = (
+    "Your theme reflects your {personality} and {creativity} nature, with {ancestry} \n"
+    "    ancestry influences. The {primary} primary color represents your {personality} \n"
+    "    tendencies, while the {font} font was selected to complement your \n"
+    "    {creativity} and {analytical} traits. The {layout} layout style \n"
+    "    brings everything together in a way that resonates with your unique personality profile."
+)
+
+TEMPLATES = {
+    'en': ExplanationTemplate(EN_TEXT, **EN_LABELS),
+    # Same text on a single line, without the source indentation
+    'en-plain': ExplanationTemplate(' '.join(line.strip() for line in EN_TEXT.splitlines()),
+                                    **EN_LABELS),
+    'es': ExplanationTemplate(
+        "Tu tema refleja tu carácter {personality} y {creativity}, con influencias de "
+        "ascendencia {ancestry}. El color principal {primary} representa ese carácter "
+        "{personality}, mientras que la fuente {font} se eligió para complementar tu perfil "
+        "{creativity} y tu lado {analytical}. El estilo de diseño {layout} lo une todo de una "
+        "forma que resuena con tu perfil de personalidad único.",
+        personality={'high': "muy extrovertido", 'low': "más introvertido", 'mid': "equilibrado"},
+        creativity={'high': "muy creativo", 'low': "práctico", 'mid': "moderadamente creativo"},
+        analytical={'high': "analítico", 'mid': "intuitivo"},
+        mixed_ancestry='mixta'
+    )
+}
+
+
+def register_template(name, template):
+    """Add or replace the template for a locale or variant"""
+    TEMPLATES[name] = template
+    compile_explanation.cache_clear()
+
+
+def trait_buckets(traits):
+    """Return the (personality, creativity, analytical) bucket names for traits"""
+    extroversion = traits.get('extroversion', 0.5)
+    creativity = traits.get('creativity', 0.5)
+    if extroversion > 0.7:
+        personality_bucket = 'high'
+    elif extroversion < 0.3:
+        personality_bucket = 'low'
+    else:
+        personality_bucket = 'mid'
+    if creativity > 0.7:
+        creativity_bucket = 'high'
+    elif creativity < 0.3:
+        creativity_bucket = 'low'
+    else:
+        creativity_bucket = 'mid'
+    analytical_bucket = 'high' if traits.get('analytical', 0.5) > 0.7 else 'mid'
+    return personality_bucket, creativity_bucket, analytical_bucket
+
+
+@lru_cache(maxsize=4096)
+def compile_explanation(locale, buckets, ancestry_key):
+    """Return (fragments, order) with everything but the THEME_FIELDS filled in.
+
+    fragments are the four pieces of text around the theme fields, and order
+    the THEME_FIELDS indexes in the order the template uses them.
+    """
+    template = TEMPLATES[locale]
+    personality, creativity, analytical = buckets
+    if ancestry_key is None:
+        ancestry_readable = template.mixed_ancestry
+    else:
+        ancestry_readable = ancestry_key.replace('_', ' ').title()
+    values = {
+        'personality': template.personality[personality],
+        'creativity': template.creativity[creativity],
+        'analytical': template.analytical[analytical],
+        'ancestry': ancestry_readable
+    }
+
+    fragments = []
+    order = []
+    current = []
+    for literal, field, _, _ in string.Formatter().parse(template.text):
+        current.append(literal)
+        if field is None:
+            continue
+        if field in THEME_FIELDS:
+            fragments.append(''.join(current))
+            current = []
+            order.append(THEME_FIELDS.index(field))
+        else:
+            current.append(values[field])
+    fragments.append(''.join(current))
+    if sorted(order) != list(range(len(THEME_FIELDS))):
+        raise ValueError(f"Explanation template {locale!r} must use each of "
+                         f"{', '.join(THEME_FIELDS)} exactly once")
+    order = tuple(order)
+    return tuple(fragments), None if order == _IN_ORDER else order
+
+
+_IN_ORDER = tuple(range(len(THEME_FIELDS)))
+
+
+def _join(fragments, order, primary, font, layout):
+    values = (primary, font, layout)
+    if order is not None:
+        values = [values[index] for index in order]
+    return ''.join((fragments[0], values[0], fragments[1], values[1],
+                    fragments[2], values[2], fragments[3]))
+
+
+def render_explanation(theme, traits, ancestry, locale='en'):
+    """Explanation text for one theme"""
+    ancestry_key = dominant_ancestry(ancestry)
+    fragments, order = compile_explanation(locale, trait_buckets(traits), ancestry_key)
+    return _join(fragments, order, theme['colors']['primary'], theme['font']['name'],
+                 theme['layout']['name'])
+
+
+def render_explanations(themes, traits_list, ancestry_list, locale='en'):
+    """Explanation texts for many themes, in input order.
+
+    Themes may be theme dicts or compact theme_model.Theme tuples.
+    """
+    compiled = compile_explanation
+    explanations = []
+    append = explanations.append
+    for theme, traits, ancestry in zip(themes, traits_list, ancestry_list):
+        ancestry_key = dominant_ancestry(ancestry)
+        fragments, order = compiled(locale, trait_buckets(traits), ancestry_key)
+        if isinstance(theme, dict):
+            fields = theme['colors']['primary'], theme['font']['name'], theme['layout']['name']
+        else:
+            fields = theme.primary, theme.font.name, theme.layout.name
+        if order is None:
+            append(''.join((fragments[0], fields[0], fragments[1], fields[1],
+                            fragments[2], fields[2], fragments[3])))
+        else:
+            append(_join(fragments, order, *fields))
+    return explanations
@@ -0,0 +1,191 @@
+"""Extract genetic_markers from raw genotype exports.
+
+Raw exports from 23andMe, AncestryDNA and MyHeritage hold ~600k SNP rows
+(15-30 MB), of which a profile only needs a handful. The file is memory
+mapped and each wanted rsID is located with a substring search for its
+line prefix, so rows that are not needed are never split or decoded. For
+long marker lists a single pass over the lines is cheaper, and that is used
+instead.
+
+    python genotype.py genome.txt -o profile.json
+    python genotype.py genome.txt --base examples/sample1.json --markers rs4680,rs53576
+"""
+import argparse
+import json
+import mmap
+import sys
+
+DEFAULT_MARKERS = ('rs4680', 'rs1800497', 'rs53576', 'rs2268498', 'rs6265', 'rs25531')
+
+# Above this many markers, one scan of all lines beats one search per marker
+FIND_LIMIT = 16
+
+# Genotype values meaning the SNP could not be read
+NO_CALLS = {'--', '00', '0', '-', ''}
+
+# How far into the file to look for the header that names the source
+HEADER_SIZE = 4096
+
+
+class MarkerIndex:
+    """Search needles and lookup set for a fixed list of rsIDs, built once and reused"""
+
+    def __init__(self, markers=DEFAULT_MARKERS):
+        self.markers = tuple(dict.fromkeys(marker.strip().lower() for marker in markers))
+        self.wanted = frozenset(marker.encode('ascii') for marker in self.markers)
+        self.tab_needles = {marker: b'\n' + marker + b'\t' for marker in self.wanted}
+        self.csv_needles = {marker: b'\n"' + marker + b'",' for marker in self.wanted}
+
+
+def detect_source(header):
+    """Name of the service that produced an export, from its first bytes"""
+    text = header.decode('utf-8', 'replace').lower()
+    if '23andme' in text:
+        return '23andMe'
+    if 'ancestrydna' in text:
+        return 'AncestryDNA'
+    if 'myheritage' in text:
+        return 'MyHeritage'
+    return None
+
+
+def is_csv(header):
+    """Whether the first data or column header line is comma-separated (MyHeritage)"""
+    for line in header.splitlines():
+        if line.strip() and not line.startswith(b'#'):
+            return b',' in line and b'\t' not in line
+    return False
+
+
+def parse_row(line, csv):
+    """Return (rsid, genotype) for one raw line, genotype None for no-calls"""
+    line = line.rstrip(b'\r\n')
+    if csv:
+        fields = [field.strip(b'"') for field in line.split(b',')]
+    else:
+        fields = line.split(b'\t')
+    if len(fields) < 4:
+        return None, None
+    if len(fields) >= 5:
+        alleles = fields[3].decode('ascii', 'replace') + fields[4].decode('ascii', 'replace')
+    else:
+        alleles = fields[3].decode('ascii', 'replace')
+    alleles = alleles.strip().upper()
+    rsid = fields[0].decode('ascii', 'replace').lower()
+    if alleles in NO_CALLS:
+        return rsid, None
+    return rsid, '/'.join(alleles) if len(alleles) == 2 else alleles
+
+
+def _line_at(buffer, start):
+    end = buffer.find(b'\n', start)
+    return buffer[start:end if end != -1 else len(buffer)]
+
+
+def find_markers(buffer, index, csv=False):
+    """Locate each wanted marker with one substring search, returning {rsid: genotype}"""
+    needles = index.csv_needles if csv else index.tab_needles
+    markers = {}
+    for marker, needle in needles.items():
+        position = buffer.find(needle)
+        if position != -1:
+            start = position + 1
+        elif buffer[:len(needle) - 1] == needle[1:]:
+            # The first row of a file without a header has no newline before it
+            start = 0
+        else:
+            continue
+        rsid, genotype = parse_row(_line_at(buffer, start), csv)
+        if genotype is not None:
+            markers[rsid] = genotype
+    return markers
+
+
+def scan_markers(lines, index, csv=False):
+    """Check every line's rsID against the index, returning {rsid: genotype}.
+
+    lines may be any iterable of bytes lines, so this also works on streams.
+    """
+    wanted = index.wanted
+    separator = b',' if csv else b'\t'
+    markers = {}
+    for line in lines:
+        if line[:1] == b'#':
+            continue
+        rsid = line[:line.find(separator)]
+        if csv:
+            rsid = rsid.strip(b'"')
+        if rsid in wanted and rsid.decode('ascii') not in markers:
+            rsid, genotype = parse_row(line, csv)
+            if genotype is not None:
+                markers[rsid] = genotype
+    return markers
+
+
+def read_markers(path, index=None):
+    """Extract the indexed markers from a raw export file.
+
+    Returns (genetic_markers, dna_source), dna_source being None when the
+    header does not name a known service.
+    """
+    index = index or MarkerIndex()
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        if not header:
+            return {}, None
+        source = detect_source(header)
+        csv = is_csv(header)
+        f.seek(0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if len(index.wanted) <= FIND_LIMIT:
+                markers = find_markers(buffer, index, csv)
+            else:
+                markers = scan_markers(iter(buffer.readline, b''), index, csv)
+    return {marker: markers[marker] for marker in index.markers if marker in markers}, source
+
+
+def ingest(path, index=None, base=None):
+    """Build a DNA profile dict from a raw export, optionally on top of a base profile.
+
+    The base supplies personality_traits, ancestry and the rest. Without
+    one, theme generation falls back to its defaults for those.
+    """
+    markers, source = read_markers(path, index)
+    profile = dict(base or {})
+    profile['genetic_markers'] = markers
+    metadata = dict(profile.get('metadata') or {})
+    if source:
+        metadata['dna_source'] = source
+    profile['metadata'] = metadata
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract genetic markers from a raw genotype export")
+    parser.add_argument('path', help="23andMe, AncestryDNA or MyHeritage raw data file")
+    parser.add_argument('--markers', default=','.join(DEFAULT_MARKERS),
+                        help="comma-separated rsIDs to extract")
+    parser.add_argument('--base', help="JSON profile to add the markers to")
+    parser.add_argument('-o', '--output', default='-')
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.base:
+        with open(args.base, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+    index = MarkerIndex(marker for marker in args.markers.split(',') if marker.strip())
+    profile = ingest(args.path, index, base)
+
+    text = json.dumps(profile, indent=2) + '\n'
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    found = len(profile['genetic_markers'])
+    print(f"{found} of {len(index.markers)} markers found", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""Load test the web app with synthetic DNA profiles and report against an SLO.
+
+Starts the app under gunicorn (or targets an already running --url), then
+sends requests at fixed rates for each stage, open-loop: latency is measured
+from when a request was due to be sent, so a saturated server shows up as
+rising latency instead of a silently lower request rate.
+
+    python loadtest.py --rates 10,25,50 --duration 30 -o load.json --html load.html
+    python loadtest.py --url http://127.0.0.1:8000 --flows api,batch
+    python loadtest.py --compare load-main.json -o load.json
+
+Flows:
+    upload  POST / with a profile file, then GET /results with the session cookie
+    api     POST /api/v1/theme
+    batch   POST /api/v1/themes:batch with --batch-size profiles
+"""
+import argparse
+import html
+import http.client
+import json
+import platform
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from synthetic import make_profiles
+
+DEFAULT_SERVER = 'gunicorn app:app -w 4 -b {host}:{port}'
+PERCENTILES = (50, 90, 95, 99)
+# Request errors kept per endpoint, as examples for the report
+MAX_ERROR_SAMPLES = 5
+
+
+class Client:
+    """HTTP client with one keep-alive connection per thread"""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        """Return (status, headers, body), reconnecting once if the connection was dropped"""
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self._local.conn = conn
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.headers, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                self._local.conn = None
+                raise
+
+
+class Recorder:
+    """Thread-safe latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.error_samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, error=None):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                samples = self.error_samples.setdefault(endpoint, [])
+                if len(samples) < MAX_ERROR_SAMPLES:
+                    samples.append(error)
+
+    def summary(self, elapsed):
+        return {
+            endpoint: summarize(latencies, self.errors.get(endpoint, 0),
+                                self.error_samples.get(endpoint, []), elapsed)
+            for endpoint, latencies in sorted(self.latencies.items())
+        }
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, errors, error_samples, elapsed):
+    ordered = sorted(latencies)
+    stats = {
+        'requests': len(ordered),
+        'errors': errors,
+        'error_rate': errors / len(ordered) if ordered else 0.0,
+        'throughput': (len(ordered) - errors) / elapsed if elapsed else 0.0,
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else None,
+        'max_ms': ordered[-1] * 1000 if ordered else None,
+        'error_samples': error_samples
+    }
+    for percent in PERCENTILES:
+        value = percentile(ordered, percent)
+        stats[f"p{percent}_ms"] = value * 1000 if value is not None else None
+    return stats
+
+
+def multipart_body(field, filename, data):
+    """Encode a single file upload as multipart/form-data, returning (body, content type)"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/json\r\n\r\n"
+    ).encode('utf-8') + data + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def upload_flow(client, payloads, index, due, recorder):
+    """Upload a profile, then fetch /results with the returned session cookie"""
+    body, content_type = multipart_body('dna_file', 'dna.json', payloads['profile'][index])
+    try:
+        status, headers, _ = client.request('POST', '/', body, {'Content-Type': content_type})
+    except Exception as e:
+        recorder.record('upload', time.perf_counter() - due, f"{type(e).__name__}: {e}")
+        return
+    location = headers.get('Location', '')
+    if status != 302 or not location.endswith('/results'):
+        recorder.record('upload', time.perf_counter() - due,
+                        f"status {status}, redirected to {location or 'nowhere'}")
+        return
+    recorder.record('upload', time.perf_counter() - due)
+
+    cookie = (headers.get('Set-Cookie') or '').split(';', 1)[0]
+    started = time.perf_counter()
+    try:
+        status, _, _ = client.request('GET', '/results', headers={'Cookie': cookie})
+    except Exception as e:
+        recorder.record('results', time.perf_counter() - started, f"{type(e).__name__}: {e}")
+        return
+    recorder.record('results', time.perf_counter() - started,
+                    None if status == 200 else f"status {status}")
+
+
+def json_flow(endpoint, path, payload_name):
+    def flow(client, payloads, index, due, recorder):
+        try:
+            status, _, _ = client.request('POST', path, payloads[payload_name][index],
+                                          {'Content-Type': 'application/json'})
+        except Exception as e:
+            recorder.record(endpoint, time.perf_counter() - due, f"{type(e).__name__}: {e}")
+            return
+        recorder.record(endpoint, time.perf_counter() - due,
+                        None if status == 200 else f"status {status}")
+    return flow
+
+
+FLOWS = {
+    'upload': upload_flow,
+    'api': json_flow('api', '/api/v1/theme', 'profile'),
+    'batch': json_flow('batch', '/api/v1/themes:batch', 'batch')
+}
+
+
+def build_payloads(count, batch_size, seed=0):
+    """Pre-encode request bodies so the load generator does no JSON work while running"""
+    profiles = make_profiles(count, seed)
+    encoded = [json.dumps(profile).encode('utf-8') for profile in profiles]
+    batches = [
+        ('[' + ','.join(encoded[(start + offset) % count].decode('utf-8')
+                        for offset in range(batch_size)) + ']').encode('utf-8')
+        for start in range(0, count, max(1, count // 20))
+    ]
+    return {'profile': encoded, 'batch': batches}
+
+
+def run_stage(client, flows, rate, duration, concurrency, payloads):
+    """Send flows round-robin at rate per second for duration seconds"""
+    recorder = Recorder()
+    total = max(1, int(rate * duration))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total):
+            due = started + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            flow = FLOWS[flows[i % len(flows)]]
+            payload_count = len(payloads['batch'] if flow is FLOWS['batch'] else payloads['profile'])
+            executor.submit(flow, client, payloads, i % payload_count, due, recorder)
+    elapsed = time.perf_counter() - started
+    return {'rate': rate, 'duration': elapsed, 'endpoints': recorder.summary(elapsed)}
+
+
+def check_slo(stages, p99_ms, error_rate):
+    """Return a list of SLO violations across all stages and endpoints"""
+    violations = []
+    for stage in stages:
+        for endpoint, stats in stage['endpoints'].items():
+            if stats['p99_ms'] is not None and stats['p99_ms'] > p99_ms:
+                violations.append(f"{stage['rate']}/s {endpoint}: p99 {stats['p99_ms']:.1f} ms "
+                                  f"> {p99_ms:.1f} ms")
+            if stats['error_rate'] > error_rate:
+                violations.append(f"{stage['rate']}/s {endpoint}: error rate "
+                                  f"{stats['error_rate']:.2%} > {error_rate:.2%}")
+    return violations
+
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, host, port, timeout=30):
+    """Start the server command and wait until it answers GET /"""
+    process = subprocess.Popen(shlex.split(command.format(host=host, port=port)))
+    client = Client(f"http://{host}:{port}", timeout=2)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            status, _, _ = client.request('GET', '/')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"Server did not answer within {timeout}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Yield (stage rate, endpoint, metric, old, new) for stages present in both reports"""
+    old_stages = {stage['rate']: stage for stage in baseline['stages']}
+    for stage in report['stages']:
+        old_stage = old_stages.get(stage['rate'])
+        if old_stage is None:
+            continue
+        for endpoint, stats in stage['endpoints'].items():
+            old = old_stage['endpoints'].get(endpoint)
+            if old is None:
+                continue
+            for metric in ('throughput', 'p99_ms', 'error_rate'):
+                yield stage['rate'], endpoint, metric, old[metric], stats[metric]
+
+
+def format_ms(value):
+    return '-' if value is None else f"{value:.1f}"
+
+
+def render_html(report):
+    """Standalone HTML page with a table per stage"""
+    slo = report['slo']
+    rows = []
+    for stage in report['stages']:
+        rows.append(f"<h2>{stage['rate']} flows/s for {stage['duration']:.1f}s</h2>")
+        rows.append("<table><tr><th>Endpoint</th><th>Requests</th><th>Errors</th>"
+                    "<th>Throughput/s</th>" +
+                    ''.join(f"<th>p{percent} ms</th>" for percent in PERCENTILES) +
+                    "<th>Max ms</th></tr>")
+        for endpoint, stats in stage['endpoints'].items():
+            rows.append(
+                f"<tr><td>{html.escape(endpoint)}</td><td>{stats['requests']}</td>"
+                f"<td>{stats['errors']} ({stats['error_rate']:.2%})</td>"
+                f"<td>{stats['throughput']:.1f}</td>" +
+                ''.join(f"<td>{format_ms(stats[f'p{percent}_ms'])}</td>" for percent in PERCENTILES) +
+                f"<td>{format_ms(stats['max_ms'])}</td></tr>")
+        rows.append("</table>")
+    violations = ''.join(f"<li>{html.escape(v)}</li>" for v in slo['violations'])
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>Traitify load test {html.escape(report['timestamp'])}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; color: #333; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+.pass {{ color: #2a7a2a; }} .fail {{ color: #b22222; }}
+</style>
+</head>
+<body>
+<h1>Load test {html.escape(report['timestamp'])}</h1>
+<p>Target {html.escape(report['target'])}, commit {html.escape(str(report['commit']))},
+flows {html.escape(', '.join(report['flows']))}, Python {html.escape(report['python'])}</p>
+<p class="{'pass' if slo['passed'] else 'fail'}">SLO p99 &le; {slo['p99_ms']:.0f} ms,
+error rate &le; {slo['error_rate']:.2%}: {'passed' if slo['passed'] else 'failed'}</p>
+<ul>{violations}</ul>
+{''.join(rows)}
+</body>
+</html>
+"""
+
+
+def print_stage(stage, file=sys.stderr):
+    print(f"{stage['rate']} flows/s over {stage['duration']:.1f}s", file=file)
+    for endpoint, stats in stage['endpoints'].items():
+        print(f"  {endpoint:8} {stats['requests']:6} req {stats['errors']:5} err "
+              f"{stats['throughput']:8.1f}/s  p50 {format_ms(stats['p50_ms']):>8}  "
+              f"p99 {format_ms(stats['p99_ms']):>8} ms", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Traitify web app")
+    parser.add_argument('--url', help="test an already running server instead of starting one")
+    parser.add_argument('--server', default=DEFAULT_SERVER,
+                        help="command that starts the server, with {host} and {port} "
+                             f"placeholders (default: '{DEFAULT_SERVER}')")
+    parser.add_argument('--flows', default='upload,api',
+                        help=f"comma-separated flows sent round-robin, from {', '.join(FLOWS)}")
+    parser.add_argument('--rates', default='10,25,50',
+                        help="comma-separated flows per second, one stage each (default: 10,25,50)")
+    parser.add_argument('--duration', type=float, default=20, help="seconds per stage")
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help="most requests in flight at once (default: 64)")
+    parser.add_argument('--profiles', type=int, default=1000,
+                        help="distinct synthetic profiles to send (default: 1000)")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--slo-p99-ms', type=float, default=500)
+    parser.add_argument('--slo-error-rate', type=float, default=0.01)
+    parser.add_argument('-o', '--output', help="write the report as JSON")
+    parser.add_argument('--html', help="write the report as HTML")
+    parser.add_argument('--compare', help="JSON report of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    flows = [flow.strip() for flow in args.flows.split(',') if flow.strip()]
+    unknown = [flow for flow in flows if flow not in FLOWS]
+    if unknown or not flows:
+        parser.error(f"unknown flows: {', '.join(unknown) or 'none given'}")
+    rates = [float(rate) for rate in args.rates.split(',')]
+    payloads = build_payloads(args.profiles, args.batch_size)
+
+    process = None
+    url = args.url
+    if url is None:
+        host = '127.0.0.1'
+        port = free_port(host)
+        process = start_server(args.server, host, port)
+        url = f"http://{host}:{port}"
+
+    try:
+        client = Client(url)
+        stages = []
+        for rate in rates:
+            stage = run_stage(client, flows, rate, args.duration, args.concurrency, payloads)
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    violations = check_slo(stages, args.slo_p99_ms, args.slo_error_rate)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'target': url if args.url else args.server,
+        'flows': flows,
+        'stages': stages,
+        'slo': {
+            'p99_ms': args.slo_p99_ms,
+            'error_rate': args.slo_error_rate,
+            'passed': not violations,
+            'violations': violations
+        }
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.html:
+        with open(args.html, 'w') as f:
+            f.write(render_html(report))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for rate, endpoint, metric, old, new in compare(report, baseline):
+            if old is None or new is None:
+                continue
+            print(f"{rate:g}/s {endpoint:8} {metric:11} {old:10.3f} -> {new:10.3f}")
+
+    for violation in violations:
+        print(f"SLO VIOLATION {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
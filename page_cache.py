@@ -0,0 +1,68 @@
+"""Cache of rendered pages keyed on a fingerprint of their template context."""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedPage = namedtuple('CachedPage', ['etag', 'body', 'gzipped'])
+
+
+def fingerprint(template, context, version=''):
+    """Stable fingerprint of a template name, its render context and the templates' version"""
+    data = json.dumps([template, context, version], sort_keys=True, separators=(',', ':'),
+                      default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:32]
+
+
+def templates_version(directory, build_id=''):
+    """Hash of every template source under directory and a build ID.
+
+    Any template edit or deploy changes it, so pages rendered from the old
+    templates no longer match their ETags.
+    """
+    digest = hashlib.sha256(build_id.encode('utf-8'))
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class PageCache:
+    """LRU of rendered pages, each stored plain and gzip-compressed"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, html):
+        body = html.encode('utf-8')
+        page = CachedPage(key, body, gzip.compress(body, compresslevel=6))
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
@@ -0,0 +1,237 @@
+"""Expand a theme's primary and accent colors into a full set of design tokens.
+
+For each of primary, accent and a neutral gray the engine produces a ramp
+of tints and shades (50 lightest ... 900 darkest, 500 is the base color),
+and for primary and accent an on-<color>-<step> text color checked against
+the WCAG contrast target. The profile's color_preferences steer the result:
+
+    warm           tints the neutral ramp warm (> 0.5) or cool (< 0.5)
+    high_contrast  above 0.5 raises the contrast target from AA (4.5) to AAA (7)
+    saturation     how much color the tints and shades keep
+
+Palettes are computed for many themes at once with NumPy, and PaletteCache
+keeps them per primary/accent/preferences combination.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from profile_parser import PREFERENCE_NAMES
+
+STEPS = (50, 100, 200, 300, 400, 500, 600, 700, 800, 900)
+# Amount mixed in per step: white for negative weights, black for positive
+STEP_WEIGHTS = np.array([-0.9, -0.8, -0.6, -0.4, -0.2, 0.0, 0.2, 0.4, 0.6, 0.8])
+BASE_STEP = STEPS.index(500)
+
+# WCAG 2 contrast ratios for normal text
+CONTRAST_AA = 4.5
+CONTRAST_AAA = 7.0
+
+WARM_HUE = 30 / 360
+COOL_HUE = 220 / 360
+
+_HEX_DIGITS = np.array([ord(c) for c in '0123456789abcdef'], dtype=np.uint32)
+# Bit offsets of the six hex digits in a packed 0xrrggbb value
+_NIBBLE_SHIFTS = np.arange(20, -1, -4)
+
+HEX_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+
+def is_hex_color(color):
+    """Whether color is a '#rrggbb' string that parse_hex accepts"""
+    return isinstance(color, str) and HEX_COLOR.match(color) is not None
+
+
+def parse_hex(colors):
+    """Return an (n, 3) array of 0-1 channels for '#rrggbb' strings"""
+    values = [int(color.lstrip('#'), 16) for color in colors]
+    packed = np.array(values, dtype=np.int64).reshape(-1, 1)
+    return ((packed >> np.array([16, 8, 0])) & 0xff) / 255.0
+
+
+def format_hex(rgb):
+    """Format an (..., 3) array of 0-1 channels as '#rrggbb' strings, flattened"""
+    channels = np.clip(np.rint(rgb * 255), 0, 255).astype(np.int64).reshape(-1, 3)
+    packed = (channels[:, 0] << 16) | (channels[:, 1] << 8) | channels[:, 2]
+    # Build the UCS-4 code points of every string and view them as a str array
+    chars = np.empty((len(packed), 7), dtype=np.uint32)
+    chars[:, 0] = ord('#')
+    chars[:, 1:] = _HEX_DIGITS[(packed[:, np.newaxis] >> _NIBBLE_SHIFTS) & 0xf]
+    return chars.view('<U7').ravel().tolist()
+
+
+def preference_row(preferences):
+    """Clean (warm, high_contrast, saturation) values from a color_preferences dict.
+
+    Missing or invalid values become 0.5, and everything is rounded to two
+    decimals so that cache keys and computed tokens line up.
+    """
+    if not isinstance(preferences, dict):
+        preferences = {}
+    row = []
+    for name in PREFERENCE_NAMES:
+        value = preferences.get(name, 0.5)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+            value = 0.5
+        row.append(round(float(value), 2))
+    return tuple(row)
+
+
+def relative_luminance(rgb):
+    """WCAG relative luminance of an (..., 3) array of 0-1 channels"""
+    linear = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return linear @ np.array([0.2126, 0.7152, 0.0722])
+
+
+def contrast_ratio(luminance_a, luminance_b):
+    lighter = np.maximum(luminance_a, luminance_b)
+    darker = np.minimum(luminance_a, luminance_b)
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def ramp(base, desaturate):
+    """Return (n, len(STEPS), 3) tints and shades of (n, 3) base colors.
+
+    desaturate (n,) moves every step except the base toward gray.
+    """
+    weights = STEP_WEIGHTS.reshape(1, -1, 1)
+    base = base[:, np.newaxis, :]
+    colors = np.where(weights < 0, base + (1 - base) * -weights, base * (1 - weights))
+    gray = colors @ np.array([0.299, 0.587, 0.114])
+    amount = desaturate.reshape(-1, 1, 1) * (weights != 0)
+    colors = colors + (gray[..., np.newaxis] - colors) * amount
+    # Contrast is checked on the 8-bit colors that end up in the tokens
+    return np.rint(np.clip(colors, 0, 1) * 255) / 255
+
+
+def neutral_base(warm):
+    """Mid gray tinted toward a warm or cool hue, per (n,) warm preference"""
+    hue = np.where(warm >= 0.5, WARM_HUE, COOL_HUE)
+    chroma = np.abs(warm - 0.5) * 0.2
+    # HSV to RGB with value 0.5, see https://en.wikipedia.org/wiki/HSL_and_HSV
+    k = (np.array([5, 3, 1]) + hue[:, np.newaxis] * 6) % 6
+    amount = np.clip(np.minimum(k, 4 - k), 0, 1)
+    return 0.5 * (1 - chroma[:, np.newaxis] * amount)
+
+
+def on_colors(ramp_colors, light, dark, target):
+    """Pick light or dark neutral text for each ramp color.
+
+    Where neither meets the target, black or white is used instead, which
+    is the best contrast possible but for mid-tones may still fall short.
+
+    ramp_colors is (n, steps, 3), light and dark are (n, 3), target is (n,).
+    """
+    luminance = relative_luminance(ramp_colors)
+    light_contrast = contrast_ratio(luminance, relative_luminance(light)[:, np.newaxis])
+    dark_contrast = contrast_ratio(luminance, relative_luminance(dark)[:, np.newaxis])
+    use_dark = dark_contrast >= light_contrast
+
+    chosen = np.where(use_dark[..., np.newaxis], dark[:, np.newaxis, :], light[:, np.newaxis, :])
+    best = np.maximum(light_contrast, dark_contrast)
+    # Pure black or white, whichever contrasts more, when the neutrals fall short
+    fallback = np.where((contrast_ratio(luminance, 0.0) >= contrast_ratio(luminance, 1.0))
+                        [..., np.newaxis], 0.0, 1.0)
+    return np.where((best < target[:, np.newaxis])[..., np.newaxis], fallback, chosen)
+
+
+def expand_palettes(primaries, accents, preferences):
+    """Compute design tokens for many themes at once.
+
+    primaries and accents are lists of '#rrggbb' strings, preferences a list
+    of preference_row() tuples. Returns a list of token dicts in input order.
+    """
+    count = len(primaries)
+    if not count:
+        return []
+    prefs = np.array(preferences, dtype=float).reshape(count, len(PREFERENCE_NAMES))
+    warm, high_contrast, saturation = prefs[:, 0], prefs[:, 1], prefs[:, 2]
+    target = np.where(high_contrast > 0.5, CONTRAST_AAA, CONTRAST_AA)
+    desaturate = (1 - saturation) * 0.5
+
+    neutral = ramp(neutral_base(warm), np.zeros(count))
+    light, dark = neutral[:, 0], neutral[:, -1]
+    ramps = {
+        'primary': ramp(parse_hex(primaries), desaturate),
+        'accent': ramp(parse_hex(accents), desaturate),
+        'neutral': neutral
+    }
+    # The base step stays exactly the theme's color
+    ramps['primary'][:, BASE_STEP] = parse_hex(primaries)
+    ramps['accent'][:, BASE_STEP] = parse_hex(accents)
+
+    names = []
+    columns = []
+    for name, colors in ramps.items():
+        names.extend(f"{name}-{step}" for step in STEPS)
+        columns.append(colors)
+        if name != 'neutral':
+            names.extend(f"on-{name}-{step}" for step in STEPS)
+            columns.append(on_colors(colors, light, dark, target))
+    hex_values = format_hex(np.concatenate(columns, axis=1))
+
+    width = len(names)
+    palettes = []
+    for row in range(count):
+        tokens = dict(zip(names, hex_values[row * width:(row + 1) * width]))
+        tokens['background'] = tokens['neutral-50']
+        tokens['text'] = tokens['neutral-900']
+        tokens['border'] = tokens['neutral-200']
+        tokens['contrast-target'] = float(target[row])
+        palettes.append(tokens)
+    return palettes
+
+
+class PaletteCache:
+    """LRU of design tokens keyed on primary, accent and preferences"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._palettes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_tokens_batch(self, items):
+        """Return token dicts for (primary, accent, color_preferences) items.
+
+        Cache misses are computed together in one expand_palettes() call.
+        """
+        keys = [(primary, accent, preference_row(preferences))
+                for primary, accent, preferences in items]
+        results = [None] * len(keys)
+        missing = {}
+        with self._lock:
+            for index, key in enumerate(keys):
+                tokens = self._palettes.get(key)
+                if tokens is None:
+                    missing.setdefault(key, []).append(index)
+                    self.misses += 1
+                else:
+                    self._palettes.move_to_end(key)
+                    results[index] = tokens
+                    self.hits += 1
+
+        if missing:
+            computed = expand_palettes(*zip(*missing))
+            with self._lock:
+                for key, tokens in zip(missing, computed):
+                    for index in missing[key]:
+                        results[index] = tokens
+                    self._palettes[key] = tokens
+                    self._palettes.move_to_end(key)
+                while len(self._palettes) > self.max_size:
+                    self._palettes.popitem(last=False)
+        return results
+
+    def get_tokens(self, primary, accent, preferences=None):
+        return self.get_tokens_batch([(primary, accent, preferences)])[0]
+
+    def clear(self):
+        with self._lock:
+            self._palettes.clear()
+
+    def __len__(self):
+        return len(self._palettes)
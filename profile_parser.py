@@ -0,0 +1,101 @@
+"""Size-limited, validating parser for uploaded DNA profiles.
+
+Only the fields theme and palette generation use are kept:
+personality_traits, ancestry, color_preferences and name. Everything else
+in the upload (genetic_markers, metadata, ...) is dropped right after
+decoding.
+orjson is used for decoding when it is installed.
+"""
+import json
+
+from theme_logic import TRAIT_NAMES
+from theme_model import Profile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAX_PROFILE_SIZE = 1024 * 1024
+MAX_ANCESTRY_ENTRIES = 64
+MAX_NAME_LENGTH = 200
+
+PREFERENCE_NAMES = ('warm', 'high_contrast', 'saturation')
+
+
+class ProfileError(ValueError):
+    """Raised for uploads that are not a usable DNA profile"""
+
+
+def decode(data):
+    """Decode JSON bytes with the fastest available backend"""
+    try:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+    except RecursionError:
+        raise ProfileError("Profile is nested too deeply")
+    except ValueError as e:
+        raise ProfileError(f"Invalid JSON: {e}")
+
+
+def _fraction(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ProfileError(f"{field} must be a number")
+    if not 0.0 <= value <= 1.0:
+        raise ProfileError(f"{field} must be between 0 and 1")
+    return float(value)
+
+
+def validate_profile(data):
+    """Build a Profile from decoded JSON, raising ProfileError if it is invalid"""
+    if not isinstance(data, dict):
+        raise ProfileError("Profile must be a JSON object")
+
+    raw_traits = data.get('personality_traits', {})
+    if not isinstance(raw_traits, dict):
+        raise ProfileError("personality_traits must be an object")
+    traits = {
+        trait: _fraction(raw_traits[trait], f"personality_traits.{trait}")
+        for trait in TRAIT_NAMES if trait in raw_traits
+    }
+
+    raw_ancestry = data.get('ancestry', {})
+    if not isinstance(raw_ancestry, dict):
+        raise ProfileError("ancestry must be an object")
+    if len(raw_ancestry) > MAX_ANCESTRY_ENTRIES:
+        raise ProfileError(f"ancestry has more than {MAX_ANCESTRY_ENTRIES} entries")
+    ancestry = {
+        str(key): _fraction(value, f"ancestry.{key}") for key, value in raw_ancestry.items()
+    }
+
+    # Preferences only tune the palette, so unusable values are ignored rather than rejected
+    raw_preferences = data.get('color_preferences')
+    if not isinstance(raw_preferences, dict):
+        raw_preferences = {}
+    preferences = {}
+    for key in PREFERENCE_NAMES:
+        try:
+            preferences[key] = _fraction(raw_preferences[key], key)
+        except (KeyError, ProfileError):
+            pass
+
+    name = data.get('name')
+    if name is not None:
+        if not isinstance(name, str):
+            raise ProfileError("name must be a string")
+        name = name[:MAX_NAME_LENGTH]
+
+    return Profile(name, traits, ancestry, preferences)
+
+
+def parse_profile(stream, max_size=MAX_PROFILE_SIZE):
+    """Read, decode and validate a profile from a binary stream.
+
+    Reads at most max_size + 1 bytes, so oversized uploads are rejected
+    without being read in full.
+    """
+    data = stream.read(max_size + 1)
+    if len(data) > max_size:
+        raise ProfileError(f"Profile is larger than {max_size} bytes")
+    return validate_profile(decode(data))
@@ -0,0 +1,186 @@
+"""Update a bulk_themes.py output file after the font and layout rules change.
+
+Colors do not depend on theme_logic.RULES, so a threshold change only moves
+profiles whose traits lie between an old and a new threshold. Those are the
+only themes recomputed; every other record keeps its theme and gets the new
+rule_version stamped on it.
+
+    python retheme.py rules -o rules.json            # snapshot RULES before editing them
+    python retheme.py plan profiles.jsonl themes.jsonl --old-rules rules.json
+    python retheme.py apply profiles.jsonl themes.jsonl --old-rules rules.json -o new.jsonl
+
+Both files must be read twice (once to count, once to write), so neither
+can be stdin.
+"""
+import argparse
+import json
+import math
+import sys
+from collections import Counter
+
+from bulk_themes import numbered_lines, read_records, theme_record
+from theme_logic import RULES, rule_version, select_font, select_layout
+
+# Record states, in report order
+STATES = ('changed', 'stale', 'unchanged', 'current', 'failed')
+
+
+def affected_regions(old_rules, new_rules):
+    """Return {trait: [(low, high), ...]} of trait ranges whose theme may differ.
+
+    A threshold comparison can only flip for values between its old and new
+    threshold, inclusive. Rules present in only one set affect their whole trait.
+    """
+    regions = {}
+    for key in set(old_rules) | set(new_rules):
+        old, new = old_rules.get(key), new_rules.get(key)
+        if old == new:
+            continue
+        trait = key.rsplit('.', 1)[-1]
+        if old is None or new is None:
+            region = (-math.inf, math.inf)
+        else:
+            region = (min(old, new), max(old, new))
+        regions.setdefault(trait, []).append(region)
+    return regions
+
+
+def in_regions(traits, regions):
+    """Whether any trait value falls inside an affected region"""
+    for trait, ranges in regions.items():
+        value = traits.get(trait, 0.5)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return True
+        if any(low <= value <= high for low, high in ranges):
+            return True
+    return False
+
+
+def paired_records(profiles_file, themes_file):
+    """Yield (line_number, dna_data, error, record) for matching input and output lines"""
+    themes = numbered_lines(themes_file)
+    for line_number, dna_data, error in read_records(numbered_lines(profiles_file)):
+        theme_line = next(themes, None)
+        record = json.loads(theme_line[1]) if theme_line else None
+        if record is None or record.get('line') != line_number:
+            raise ValueError(f"Themes file does not match profiles at line {line_number}")
+        yield line_number, dna_data, error, record
+
+
+class Retheme:
+    """Compares stored theme records against an old and a new rule set"""
+
+    def __init__(self, old_rules, new_rules=RULES):
+        self.old_rules = old_rules
+        self.new_rules = new_rules
+        self.old_version = rule_version(old_rules)
+        self.new_version = rule_version(new_rules)
+        self.regions = affected_regions(old_rules, new_rules)
+
+    def state(self, dna_data, record):
+        """Classify a record as one of STATES"""
+        if 'error' in record:
+            return 'failed'
+        version = record.get('rule_version')
+        if version == self.new_version:
+            return 'current'
+        if version != self.old_version:
+            return 'stale'
+
+        traits = dna_data.get('personality_traits', {})
+        if not in_regions(traits, self.regions):
+            return 'unchanged'
+        try:
+            same = (select_font(traits, self.old_rules) == select_font(traits, self.new_rules)
+                    and select_layout(traits, self.old_rules) == select_layout(traits, self.new_rules))
+        except Exception:
+            return 'changed'
+        return 'unchanged' if same else 'changed'
+
+    def plan(self, profiles_file, themes_file):
+        """Count records per state"""
+        counts = Counter()
+        for _, dna_data, error, record in paired_records(profiles_file, themes_file):
+            counts['failed' if error else self.state(dna_data, record)] += 1
+        return counts
+
+    def apply(self, profiles_file, themes_file, outfile):
+        """Write updated records, recomputing only changed and stale themes"""
+        counts = Counter()
+        for line_number, dna_data, error, record in paired_records(profiles_file, themes_file):
+            state = 'failed' if error else self.state(dna_data, record)
+            counts[state] += 1
+            if state in ('changed', 'stale'):
+                tokens = record.get('tokens')
+                record = theme_record(line_number, dna_data, self.new_rules, self.new_version)
+                # Palette tokens only depend on the colors, which rules never change
+                if tokens and state == 'changed' and 'theme' in record:
+                    record['tokens'] = tokens
+            elif state == 'unchanged':
+                record['rule_version'] = self.new_version
+            outfile.write(json.dumps(record) + '\n')
+        return counts
+
+
+def report(counts, file=sys.stderr):
+    total = sum(counts.values())
+    print(f"{total} records: " + ', '.join(f"{counts[state]} {state}" for state in STATES),
+          file=file)
+
+
+def load_rules(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-theme stored profiles after a rule change")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rules_command = commands.add_parser('rules', help="write the current rules as JSON")
+    rules_command.add_argument('-o', '--output', default='-')
+
+    for name, help_text in (('plan', "count the themes a rule change affects"),
+                            ('apply', "write updated themes")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('profiles', help="JSONL profiles given to bulk_themes.py")
+        command.add_argument('themes', help="bulk_themes.py output for those profiles")
+        command.add_argument('--old-rules', required=True,
+                             help="rules the themes were generated with, from 'retheme.py rules'")
+        command.add_argument('--rules', help="new rules (default: theme_logic.RULES)")
+        if name == 'apply':
+            command.add_argument('-o', '--output', required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'rules':
+        text = json.dumps(RULES, indent=2, sort_keys=True) + '\n'
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return 0
+
+    retheme = Retheme(load_rules(args.old_rules),
+                      load_rules(args.rules) if args.rules else RULES)
+    print(f"Rules {retheme.old_version} -> {retheme.new_version}, affected traits: "
+          f"{', '.join(sorted(retheme.regions)) or 'none'}", file=sys.stderr)
+
+    with open(args.profiles, 'rb') as profiles, \
+            open(args.themes, 'r', encoding='utf-8') as themes:
+        counts = retheme.plan(profiles, themes)
+    report(counts)
+    if args.command == 'plan':
+        return 0
+
+    with open(args.profiles, 'rb') as profiles, \
+            open(args.themes, 'r', encoding='utf-8') as themes, \
+            open(args.output, 'w', encoding='utf-8') as outfile:
+        retheme.apply(profiles, themes, outfile)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
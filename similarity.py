@@ -0,0 +1,338 @@
+"""Nearest-neighbor index of themes over their profiles' trait vectors.
+
+Each entry is a point in the five-trait unit cube plus its dominant
+ancestry. Points are bucketed in a uniform grid per dominant ancestry,
+sized so cells hold a few entries each. A k-nearest query visits cells in
+order of their distance from the query, widening the search until it has
+k matches and stopping once no unvisited cell can hold anything closer
+than the k-th match so far.
+
+Distance is Euclidean over the traits, plus ANCESTRY_PENALTY when the
+dominant ancestries differ.
+"""
+import gzip
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # Without file locks (Windows), merged saves are not serialized
+    fcntl = None
+
+from theme_logic import TRAIT_NAMES, dominant_ancestry
+
+ANCESTRY_PENALTY = 0.25
+
+# Average entries per grid cell, and a cap on cells per axis
+CELL_TARGET = 3
+MAX_BINS = 16
+
+# Largest possible trait distance, the diagonal of the unit cube
+MAX_DISTANCE = math.sqrt(len(TRAIT_NAMES))
+
+SNAPSHOT_VERSION = 2
+
+# Snapshots are written often and read once, so favor fast compression
+SNAPSHOT_COMPRESSION = 1
+
+
+def trait_vector(traits):
+    """Five trait values clamped to [0, 1], missing or invalid ones as 0.5"""
+    vector = []
+    for name in TRAIT_NAMES:
+        value = traits.get(name, 0.5)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+            value = 0.5
+        vector.append(min(1.0, max(0.0, float(value))))
+    return tuple(vector)
+
+
+def grid_bins(count):
+    """Bins per axis that leave about CELL_TARGET entries per cell"""
+    return max(1, min(MAX_BINS, int((count / CELL_TARGET) ** (1 / len(TRAIT_NAMES)))))
+
+
+class Grid:
+    """Uniform grid over the trait cube holding the entries of one dominant ancestry"""
+
+    def __init__(self, bins=1):
+        self.bins = bins
+        self.size = 1.0 / bins
+        self.count = 0
+        # cell -> {key: trait vector}
+        self.cells = {}
+
+    def cell(self, vector):
+        bins = self.bins
+        top = bins - 1
+        return tuple([min(top, int(value * bins)) for value in vector])
+
+    def add(self, key, vector):
+        self.cells.setdefault(self.cell(vector), {})[key] = vector
+        self.count += 1
+        if grid_bins(self.count) > self.bins:
+            self.rebuild(grid_bins(self.count))
+
+    def remove(self, key, vector):
+        cell = self.cell(vector)
+        members = self.cells[cell]
+        del members[key]
+        if not members:
+            del self.cells[cell]
+        self.count -= 1
+
+    def rebuild(self, bins):
+        entries = [item for members in self.cells.values() for item in members.items()]
+        self.bins = bins
+        self.size = 1.0 / bins
+        self.cells = {}
+        for key, vector in entries:
+            self.cells.setdefault(self.cell(vector), {})[key] = vector
+
+    def cells_within(self, vector, radius, gaps):
+        """Return [(squared gap, cell)] of the cells within radius of vector, closest first.
+
+        gaps[axis][index] is the squared distance from vector to that slab of
+        cells. When the box around the query spans more cells than are
+        occupied, only occupied cells are returned.
+        """
+        size = self.size
+        bins = self.bins
+        ranges = [range(max(0, int((value - radius) / size)),
+                        min(bins, int((value + radius) / size) + 1)) for value in vector]
+        radius2 = radius * radius
+        if math.prod(len(axis) for axis in ranges) > len(self.cells):
+            candidates = []
+            for cell in self.cells:
+                gap = sum(axis[index] for axis, index in zip(gaps, cell))
+                if gap <= radius2:
+                    candidates.append((gap, cell))
+        else:
+            # Build the cells axis by axis, dropping partial cells already too far away
+            candidates = [(0.0, ())]
+            for axis_gaps, axis in zip(gaps, ranges):
+                candidates = [(gap + axis_gaps[index], cell + (index,))
+                              for gap, cell in candidates for index in axis
+                              if gap + axis_gaps[index] <= radius2]
+        candidates.sort()
+        return candidates
+
+
+class SimilarityIndex:
+    """Grid index of (key, trait vector, dominant ancestry) entries.
+
+    Each dominant ancestry has its own grid, sized to its number of entries,
+    so entries from other ancestries are only looked at when they could
+    still beat the matches found so far. Like the theme store, the index is
+    bounded: entries older than ttl seconds are dropped, and past max_size
+    entries the oldest go first.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (trait vector, dominant ancestry, time added), oldest first
+        self._entries = OrderedDict()
+        # dominant ancestry -> Grid
+        self._grids = {}
+        self._lock = threading.Lock()
+
+    def _insert(self, key, vector, ancestry, added):
+        self._entries[key] = (vector, ancestry, added)
+        grid = self._grids.get(ancestry)
+        if grid is None:
+            grid = self._grids[ancestry] = Grid()
+        grid.add(key, vector)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        vector, ancestry, _ = entry
+        grid = self._grids[ancestry]
+        grid.remove(key, vector)
+        if not grid.count:
+            del self._grids[ancestry]
+
+    def _trim(self):
+        """Drop expired entries and the oldest ones past max_size"""
+        entries = self._entries
+        if self.max_size is not None:
+            while len(entries) > self.max_size:
+                self._discard(next(iter(entries)))
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl
+            while entries:
+                key = next(iter(entries))
+                if entries[key][2] > cutoff:
+                    break
+                self._discard(key)
+
+    def add(self, key, traits, ancestry):
+        """Insert the entry for key, replacing any earlier one"""
+        vector = trait_vector(traits)
+        ancestry = dominant_ancestry(ancestry)
+        with self._lock:
+            self._discard(key)
+            self._insert(key, vector, ancestry, time.time())
+            self._trim()
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def nearest(self, traits, ancestry, k=5, exclude=None):
+        """Return [(distance, key)] of the k nearest entries, closest first"""
+        with self._lock:
+            self._trim()
+            return self._nearest(trait_vector(traits), dominant_ancestry(ancestry), k, exclude)
+
+    def neighbors(self, key, k=5):
+        """nearest() for an indexed entry, without the entry itself; [] for unknown keys"""
+        with self._lock:
+            self._trim()
+            entry = self._entries.get(key)
+            if entry is None:
+                return []
+            vector, ancestry, _ = entry
+            return self._nearest(vector, ancestry, k, exclude=key)
+
+    def _nearest(self, vector, ancestry, k, exclude):
+        best = []  # max-heap of (-distance, key)
+        if k > 0:
+            grid = self._grids.get(ancestry)
+            if grid:
+                self._search(grid, vector, k, exclude, 0.0, best)
+            for other_ancestry, other_grid in self._grids.items():
+                if len(best) == k and -best[0][0] <= ANCESTRY_PENALTY:
+                    break
+                if other_ancestry != ancestry:
+                    self._search(other_grid, vector, k, exclude, ANCESTRY_PENALTY, best)
+        return sorted((-negative, key) for negative, key in best)
+
+    def _search(self, grid, vector, k, exclude, offset, best):
+        """Add the closest entries of one grid to the best heap, offset added to their distances"""
+
+        def limit():
+            # Trait distance an entry must beat to get into the heap
+            return -best[0][0] - offset if len(best) == k else math.inf
+
+        if limit() <= 0:
+            return
+        size = grid.size
+        # Squared distance along each axis from the query to each cell slab
+        gaps = [
+            [max(0.0, index * size - value, value - (index + 1) * size) ** 2
+             for index in range(grid.bins)]
+            for value in vector
+        ]
+        visited = set()
+        radius = size
+        while True:
+            # Search out to the k-th match so far, or a growing radius until there are k
+            bound = limit()
+            searched = min(radius, bound)
+            for gap, cell in grid.cells_within(vector, searched, gaps):
+                bound = limit()
+                if gap > bound * bound:
+                    break
+                members = grid.cells.get(cell)
+                if not members or cell in visited:
+                    continue
+                visited.add(cell)
+                for key, other in members.items():
+                    if key == exclude:
+                        continue
+                    distance = math.dist(vector, other) + offset
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key))
+            bound = limit()
+            if bound <= searched or searched >= MAX_DISTANCE:
+                return
+            radius = bound if bound != math.inf else radius * 2
+
+    def get(self, key):
+        """Return (trait vector, dominant ancestry) for key, or None"""
+        entry = self._entries.get(key)
+        return entry[:2] if entry is not None else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def snapshot(self, path, merge=False):
+        """Write all entries to a gzipped JSON file, replacing it atomically.
+
+        With merge, entries already in the file that this index does not
+        hold are kept, so several worker processes can save to one path
+        without losing each other's inserts. Merged saves are serialized
+        with a lock file next to the snapshot.
+        """
+        if not merge:
+            return self._write(path, {})
+        with open(f"{path}.lock", 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                saved = {}
+                if os.path.exists(path):
+                    saved = {key: (vector, ancestry, added)
+                             for key, vector, ancestry, added in read_snapshot(path)}
+                return self._write(path, saved)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, path, saved):
+        with self._lock:
+            saved.update(self._entries)
+        entries = self.bounded([[key, vector, ancestry, added]
+                                for key, (vector, ancestry, added) in saved.items()])
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=SNAPSHOT_COMPRESSION) as f:
+            f.write(json.dumps({'version': SNAPSHOT_VERSION, 'entries': entries}, separators=(',', ':')))
+        os.replace(temp_path, path)
+        return len(entries)
+
+    def bounded(self, entries):
+        """The [key, vector, ancestry, added] entries this index would keep, oldest first"""
+        entries = sorted(entries, key=lambda entry: entry[3])
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl
+            entries = [entry for entry in entries if entry[3] > cutoff]
+        if self.max_size is not None:
+            entries = entries[max(0, len(entries) - self.max_size):]
+        return entries
+
+    @classmethod
+    def restore(cls, path, max_size=None, ttl=None):
+        """Load an index written by snapshot(), keeping what its bounds allow"""
+        index = cls(max_size, ttl)
+        entries = index.bounded(read_snapshot(path))
+        # Size each grid for its final count up front instead of growing it
+        counts = Counter(ancestry for _, _, ancestry, _ in entries)
+        index._grids = {ancestry: Grid(grid_bins(count)) for ancestry, count in counts.items()}
+        for key, vector, ancestry, added in entries:
+            index._insert(key, tuple(vector), ancestry, added)
+        return index
+
+
+def read_snapshot(path):
+    """Return the [key, vector, ancestry, added] entries of a snapshot file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    version = data.get('version')
+    if version == 1:
+        # Version 1 did not record when entries were added, so count them as new
+        now = time.time()
+        return [entry + [now] for entry in data['entries']]
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported similarity snapshot version {version}")
+    return data['entries']
@@ -0,0 +1,64 @@
+"""Coalescing of identical concurrent work.
+
+Callers that ask for the same key while a call for it is running wait for
+that call and share its result (or exception) instead of repeating it.
+Nothing is kept once the call finishes, so shared results must not be
+modified.
+"""
+import threading
+
+
+class Flight:
+    """A call in progress, which concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time"""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        # key -> Flight for calls running right now
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        """Return func(*args), or the result of a running call with the same key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self.calls += 1
+                leader = flight = self._flights[key] = Flight()
+            else:
+                self.coalesced += 1
+                leader = None
+
+        if leader is None:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._flights)
+            }
@@ -0,0 +1,72 @@
+"""Synthetic DNA profiles matching the schema of the files in examples/."""
+import random
+
+from theme_logic import ANCESTRY_HUE_SHIFTS, TRAIT_NAMES
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Riley', 'Casey', 'Jamie']
+LAST_NAMES = ['Johnson', 'Lee', 'Garcia', 'Nakamura', 'Okafor', 'Novak', 'Silva', 'Haddad']
+MARKERS = ['rs4680', 'rs1800497', 'rs53576', 'rs2268498', 'rs6265', 'rs25531']
+GENOTYPES = ['A/A', 'A/G', 'G/G', 'C/C', 'C/T', 'T/T']
+DNA_SOURCES = ['23andMe', 'AncestryDNA', 'MyHeritage']
+
+
+def make_profile(rng, index=0):
+    """Build one random DNA profile"""
+    ancestry_keys = rng.sample(list(ANCESTRY_HUE_SHIFTS), rng.randint(1, 4))
+    weights = [rng.random() for _ in ancestry_keys]
+    total = sum(weights)
+
+    return {
+        'user_id': f"user{index}",
+        'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'personality_traits': {name: round(rng.random(), 2) for name in TRAIT_NAMES},
+        'genetic_markers': {marker: rng.choice(GENOTYPES) for marker in rng.sample(MARKERS, 4)},
+        'ancestry': {key: round(weight / total, 2) for key, weight in zip(ancestry_keys, weights)},
+        'color_preferences': {
+            'warm': round(rng.random(), 2),
+            'high_contrast': round(rng.random(), 2),
+            'saturation': round(rng.random(), 2)
+        },
+        'metadata': {
+            'analysis_date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'dna_source': rng.choice(DNA_SOURCES),
+            'version': '1.2.0'
+        }
+    }
+
+
+def make_profiles(count, seed=0):
+    """Build a reproducible list of random DNA profiles"""
+    rng = random.Random(seed)
+    return [make_profile(rng, index) for index in range(count)]
+
+
+RAW_HEADERS = {
+    '23andMe': "# This data file generated by 23andMe\n# rsid\tchromosome\tposition\tgenotype\n",
+    'AncestryDNA': "#AncestryDNA raw data download\nrsid\tchromosome\tposition\tallele1\tallele2\n",
+    'MyHeritage': "# MyHeritage DNA raw data.\nRSID,CHROMOSOME,POSITION,RESULT\n"
+}
+
+
+def write_genotype_file(path, rows=600000, source='23andMe', markers=MARKERS, seed=0):
+    """Write a raw genotype export with random SNP rows, the given markers among them"""
+    rng = random.Random(seed)
+    bases = 'ACGT'
+    marker_rows = dict(zip(rng.sample(range(rows), len(markers)), markers))
+    with open(path, 'w', encoding='ascii', newline='\n') as f:
+        f.write(RAW_HEADERS[source])
+        lines = []
+        for row in range(rows):
+            rsid = marker_rows.get(row) or f"rs{rng.randrange(10 ** 9)}"
+            chromosome = row * 23 // rows + 1
+            first, second = rng.choice(bases), rng.choice(bases)
+            if source == 'AncestryDNA':
+                lines.append(f"{rsid}\t{chromosome}\t{row * 5000}\t{first}\t{second}\n")
+            elif source == 'MyHeritage':
+                lines.append(f'"{rsid}","{chromosome}","{row * 5000}","{first}{second}"\n')
+            else:
+                lines.append(f"{rsid}\t{chromosome}\t{row * 5000}\t{first}{second}\n")
+            if len(lines) >= 10000:
+                f.write(''.join(lines))
+                lines = []
+        f.write(''.join(lines))
@@ -0,0 +1,124 @@
+"""Static, content-hashed CSS files for generated themes.
+
+Each distinct theme gets a small stylesheet with its colors and font, named
+after a hash of its content, so it never changes once written and can be
+cached indefinitely. Gzip variants are always written next to it, and
+Brotli variants when the brotli package is installed.
+
+    python theme_assets.py profiles.jsonl            # pre-build for a JSONL export
+    python theme_assets.py examples/*.json           # or for single-profile files
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+THEME_CSS_DIR = os.path.join('static', 'css', 'themes')
+
+THEME_CSS_TEMPLATE = """:root {{
+    --primary-color: {primary};
+    --accent-color: {accent};
+    --font-family: "{font}", sans-serif;
+}}
+"""
+
+
+def render_theme_css(theme):
+    """Stylesheet text for a theme's colors and font"""
+    return THEME_CSS_TEMPLATE.format(
+        primary=theme['colors']['primary'],
+        accent=theme['colors']['accent'],
+        font=theme['font_name']
+    )
+
+
+def asset_name(css):
+    return 'theme-' + hashlib.sha256(css.encode('utf-8')).hexdigest()[:16] + '.css'
+
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def write_theme_css(theme, directory=THEME_CSS_DIR):
+    """Write a theme's stylesheet and compressed variants, returning its file name.
+
+    Existing files are left alone, since the name already pins the content.
+    """
+    css = render_theme_css(theme)
+    name = asset_name(css)
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return name
+
+    os.makedirs(directory, exist_ok=True)
+    data = css.encode('utf-8')
+    _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + '.br', brotli.compress(data, quality=11))
+    # The plain file goes last, its presence marks the asset as complete
+    _write_atomic(path, data)
+    return name
+
+
+def load_profiles(paths):
+    """Yield DNA profiles from .json files and .jsonl exports, skipping bad lines"""
+    from bulk_themes import numbered_lines, read_records
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            if path.endswith('.jsonl'):
+                for _, dna_data, error in read_records(numbered_lines(f)):
+                    if not error:
+                        yield dna_data
+            else:
+                yield json.load(f)
+
+
+def build(paths, directory=THEME_CSS_DIR, chunk_size=10000):
+    """Write stylesheets for every distinct theme in the given profile files.
+
+    Returns (profiles, assets) counts.
+    """
+    from bulk_themes import chunked
+    from theme_batch import generate_themes_batch
+
+    written = set()
+    total = 0
+    for chunk in chunked(load_profiles(paths), chunk_size):
+        total += len(chunk)
+        for theme, _ in generate_themes_batch(chunk):
+            if theme is None:
+                continue
+            css_key = (theme['colors']['primary'], theme['colors']['accent'], theme['font_name'])
+            if css_key not in written:
+                written.add(css_key)
+                write_theme_css(theme, directory)
+    return total, len(written)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-build theme stylesheets for DNA profiles")
+    parser.add_argument('paths', nargs='+', help=".json profiles or .jsonl exports")
+    parser.add_argument('-o', '--output-dir', default=THEME_CSS_DIR)
+    args = parser.parse_args(argv)
+
+    total, assets = build(args.paths, args.output_dir)
+    print(f"{total} profiles, {assets} distinct stylesheets in {args.output_dir}")
+    if brotli is None:
+        print("brotli is not installed, only .gz variants were written")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
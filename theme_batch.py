@@ -0,0 +1,257 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from explanations import render_explanations
+from theme_logic import (ANCESTRY_HUE_SHIFTS, FONTS, LAYOUTS, RULES, TRAIT_NAMES, build_theme_model,
+                         dominant_ancestry)
+from theme_model import Theme
+
+# Catalog entries in the order of the bucket indexes computed below
+FONT_BUCKETS = [
+    FONTS['creative_extrovert'],
+    FONTS['creative_introvert'],
+    FONTS['analytical_extrovert'],
+    FONTS['analytical_introvert'],
+    FONTS['balanced']
+]
+
+LAYOUT_BUCKETS = [
+    LAYOUTS['bold'],
+    LAYOUTS['minimal'],
+    LAYOUTS['warm'],
+    LAYOUTS['structured'],
+    LAYOUTS['balanced']
+]
+
+_HEX_BYTES = ['{:02x}'.format(i) for i in range(256)]
+
+# Trait value types the vectorized path reproduces exactly
+_NUMERIC_TYPES = (float, int, bool)
+
+
+def pack_profiles(profiles):
+    """Pack DNA profiles into columnar arrays.
+
+    Returns (traits, hue_shifts, fallback) where traits is an (n, 5) float
+    array in TRAIT_NAMES order, hue_shifts holds the accent shift of each
+    profile's dominant ancestry and fallback flags rows whose data is unusual
+    enough that they are sent through the scalar build_theme_model instead.
+    """
+    n = len(profiles)
+    traits = np.full((n, len(TRAIT_NAMES)), 0.5)
+    hue_shifts = np.full(n, 0.5)
+    fallback = np.zeros(n, dtype=bool)
+
+    for row, dna_data in enumerate(profiles):
+        try:
+            profile_traits = dna_data.get('personality_traits', {})
+            ancestry = dna_data.get('ancestry', {})
+            values = [profile_traits.get(name, 0.5) for name in TRAIT_NAMES]
+            if not all(type(value) in _NUMERIC_TYPES for value in values):
+                fallback[row] = True
+                continue
+            traits[row] = values
+            if ancestry:
+                hue_shifts[row] = ANCESTRY_HUE_SHIFTS.get(dominant_ancestry(ancestry), 0.5)
+        except Exception:
+            fallback[row] = True
+
+    # NaN and infinite traits make the scalar path fail, let it report them
+    fallback |= ~np.isfinite(traits).all(axis=1)
+    traits[fallback] = 0.5
+
+    return traits, hue_shifts, fallback
+
+
+def hsv_to_rgb(h, s, v):
+    """Vectorized colorsys.hsv_to_rgb, operation-for-operation identical"""
+    i = np.trunc(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = np.mod(i, 6)
+
+    conditions = [i == 0, i == 1, i == 2, i == 3, i == 4, i == 5]
+    r = np.select(conditions, [v, q, p, p, t, v])
+    g = np.select(conditions, [t, v, v, q, p, p])
+    b = np.select(conditions, [p, p, t, v, v, q])
+
+    grey = s == 0.0
+    return np.where(grey, v, r), np.where(grey, v, g), np.where(grey, v, b)
+
+
+def rgb_to_hsv(r, g, b):
+    """Vectorized colorsys.rgb_to_hsv, operation-for-operation identical"""
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    grey = minc == maxc
+
+    # Avoid dividing by zero on grey rows, they are overwritten below
+    safe_maxc = np.where(maxc == 0.0, 1.0, maxc)
+    safe_rangec = np.where(grey, 1.0, rangec)
+    s = rangec / safe_maxc
+    rc = (maxc - r) / safe_rangec
+    gc = (maxc - g) / safe_rangec
+    bc = (maxc - b) / safe_rangec
+
+    h = np.where(r == maxc, bc - gc,
+                 np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.mod(h / 6.0, 1.0)
+
+    return np.where(grey, 0.0, h), np.where(grey, 0.0, s), maxc
+
+
+def scale_channel(channel):
+    """Scale a 0-1 channel to a 0-255 integer like int(c * 255)"""
+    return np.trunc(channel * 255).astype(np.int64)
+
+
+def _hex_column(r, g, b):
+    """Format integer RGB columns as hex strings"""
+    colors = []
+    for red, green, blue in zip(r.tolist(), g.tolist(), b.tolist()):
+        if 0 <= red < 256 and 0 <= green < 256 and 0 <= blue < 256:
+            colors.append('#' + _HEX_BYTES[red] + _HEX_BYTES[green] + _HEX_BYTES[blue])
+        else:
+            colors.append('#{:02x}{:02x}{:02x}'.format(red, green, blue))
+    return colors
+
+
+def compute_colors(traits, hue_shifts):
+    """Compute primary and accent hex colors for packed traits"""
+    extroversion = traits[:, 0]
+    creativity = traits[:, 1]
+    analytical = traits[:, 2]
+
+    base_hue = 0.6 - (extroversion * 0.4)
+    saturation = 0.5 + (creativity * 0.5)
+    value = 0.7 + (analytical * 0.3)
+
+    r, g, b = (scale_channel(c) for c in hsv_to_rgb(base_hue, saturation, value))
+
+    h, s, v = rgb_to_hsv(r / 255, g / 255, b / 255)
+    new_hue = np.mod(h + hue_shifts, 1.0)
+    accent_r, accent_g, accent_b = (scale_channel(c) for c in hsv_to_rgb(new_hue, s, v))
+
+    return _hex_column(r, g, b), _hex_column(accent_r, accent_g, accent_b)
+
+
+def compute_font_buckets(traits, rules=RULES):
+    """Return indexes into FONT_BUCKETS, mirroring get_font_from_traits"""
+    extrovert = traits[:, 0] > rules['font.extroversion']
+    creative = traits[:, 1] > rules['font.creativity']
+    analytical = traits[:, 2] > rules['font.analytical']
+    return np.select(
+        [
+            creative & extrovert,
+            creative & ~extrovert,
+            analytical & extrovert,
+            analytical & ~extrovert,
+        ],
+        [0, 1, 2, 3],
+        default=4
+    )
+
+
+def compute_layout_buckets(traits, rules=RULES):
+    """Return indexes into LAYOUT_BUCKETS, mirroring get_layout_from_traits"""
+    extroversion = traits[:, 0]
+    empathy = traits[:, 3]
+    risk_taking = traits[:, 4]
+    return np.select(
+        [
+            (extroversion > rules['layout.bold.extroversion'])
+            & (risk_taking > rules['layout.bold.risk_taking']),
+            (extroversion < rules['layout.minimal.extroversion'])
+            & (risk_taking < rules['layout.minimal.risk_taking']),
+            empathy > rules['layout.warm.empathy'],
+            (risk_taking < rules['layout.structured.risk_taking'])
+            & (extroversion > rules['layout.structured.extroversion']),
+        ],
+        [0, 1, 2, 3],
+        default=4
+    )
+
+
+def generate_theme_models_batch(profiles):
+    """Generate compact Theme objects for many DNA profiles at once.
+
+    Returns a list in input order holding a Theme, or None for profiles
+    theme generation fails on. Explanations are not rendered.
+    """
+    profiles = list(profiles)
+    traits, hue_shifts, fallback = pack_profiles(profiles)
+
+    primaries, accents = compute_colors(traits, hue_shifts)
+    font_buckets = compute_font_buckets(traits).tolist()
+    layout_buckets = compute_layout_buckets(traits).tolist()
+    fallback = fallback.tolist()
+
+    themes = []
+    for row, dna_data in enumerate(profiles):
+        if fallback[row]:
+            try:
+                themes.append(build_theme_model(dna_data))
+            except Exception:
+                themes.append(None)
+            continue
+        themes.append(Theme(primaries[row], accents[row],
+                            FONT_BUCKETS[font_buckets[row]], LAYOUT_BUCKETS[layout_buckets[row]]))
+    return themes
+
+
+def generate_themes_batch(profiles, locale='en'):
+    """Generate themes for many DNA profiles at once.
+
+    Returns a list of (theme, explanation) tuples in input order, identical
+    to calling theme_logic.generate_theme on each profile, except that
+    failures are returned as (None, None) without being printed.
+    """
+    profiles = list(profiles)
+    models = generate_theme_models_batch(profiles)
+    rows = [row for row, model in enumerate(models) if model is not None]
+    themed = [models[row] for row in rows]
+    traits_list = [profiles[row].get('personality_traits', {}) for row in rows]
+    ancestry_list = [profiles[row].get('ancestry', {}) for row in rows]
+    try:
+        explanations = render_explanations(themed, traits_list, ancestry_list, locale)
+    except Exception:
+        # Find the profiles that cannot be explained one at a time
+        explanations = []
+        for model, traits, ancestry in zip(themed, traits_list, ancestry_list):
+            try:
+                explanations.append(render_explanations([model], [traits], [ancestry], locale)[0])
+            except Exception:
+                explanations.append(None)
+
+    results = [(None, None)] * len(profiles)
+    for row, model, explanation in zip(rows, themed, explanations):
+        if explanation is not None:
+            results[row] = (model.to_dict(), explanation)
+    return results
+
+
+def _chunks(items, size):
+    """Split a list into consecutive slices of up to size items"""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def generate_themes_parallel(profiles, workers=None, chunk_size=1000):
+    """Generate themes for many DNA profiles across a process pool.
+
+    Profiles are sent to workers in chunks of chunk_size, each themed with
+    generate_themes_batch, and the results are returned in input order.
+    workers defaults to one per CPU.
+    """
+    profiles = list(profiles)
+    if workers == 1 or len(profiles) <= chunk_size:
+        return generate_themes_batch(profiles)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(generate_themes_batch, _chunks(profiles, chunk_size)):
+            results.extend(chunk_results)
+    return results
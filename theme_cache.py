@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+from single_flight import Flight
+from theme_logic import TRAIT_NAMES, dominant_ancestry, generate_theme
+
+
+def theme_key(dna_data, precision=None):
+    """Build the cache key for a DNA profile.
+
+    The key holds the five trait values (None when missing) and the dominant
+    ancestry. With a precision, numeric traits are rounded to that many
+    decimals so near-duplicate profiles share an entry. Raises TypeError if
+    the profile holds values that cannot be part of a key.
+    """
+    traits = dna_data.get('personality_traits', {})
+    values = []
+    for name in TRAIT_NAMES:
+        value = traits.get(name)
+        if precision is not None and isinstance(value, (int, float)):
+            value = round(value, precision)
+        values.append(value)
+    key = (tuple(values), dominant_ancestry(dna_data.get('ancestry', {})))
+    hash(key)
+    return key
+
+
+def key_profile(key):
+    """Rebuild a minimal DNA profile that produces the theme for a key"""
+    values, ancestry = key
+    traits = {name: value for name, value in zip(TRAIT_NAMES, values) if value is not None}
+    return {
+        'personality_traits': traits,
+        'ancestry': {ancestry: 1.0} if ancestry is not None else {}
+    }
+
+
+class ThemeCache:
+    """LRU cache of (theme, explanation) results with optional TTL.
+
+    Concurrent misses for the same key are coalesced: the first caller
+    generates the theme and the others wait for its result. Cached themes
+    are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, precision=None, generate=generate_theme):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precision = precision
+        self.generate = generate
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        # key -> Flight for themes being generated right now
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_theme(self, dna_data):
+        """Return (theme, explanation) for a profile, like generate_theme"""
+        try:
+            key = theme_key(dna_data, self.precision)
+        except Exception:
+            # Malformed profiles are left to the generator to report
+            return self.generate(dna_data)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                self.expirations += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                self.misses += 1
+                leader = flight = self._flights[key] = Flight()
+            else:
+                self.coalesced += 1
+                leader = None
+
+        if leader is None:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            # With quantized keys, theme the canonical profile so every member of
+            # the bucket gets the same result whichever arrived first
+            result = self.generate(key_profile(key) if self.precision is not None else dna_data)
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            flight.result = result
+        finally:
+            expires = now + self.ttl if self.ttl is not None else None
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and result[0] is not None:
+                    self._entries[key] = (expires, result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            flight.done.set()
+        return result
+
+    def clear(self):
+        """Drop all cached themes"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return cache counters as a dict"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._flights)
+            }
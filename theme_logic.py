@@ -1,4 +1,89 @@
 import colorsys
+import hashlib
+import json
+
+from theme_model import Font, Layout, Theme
+
+# Optional precomputed color lookup, see theme_table.install()
+color_table = None
+
+# Personality traits a profile can carry, in the order batch arrays use
+TRAIT_NAMES = ('extroversion', 'creativity', 'analytical', 'empathy', 'risk_taking')
+
+# Hue shift for the accent color, per dominant ancestry - move around the color wheel
+ANCESTRY_HUE_SHIFTS = {
+    'european': 0.5,  # Opposite on color wheel
+    'eastern_european': 0.45,
+    'mediterranean': 0.4,
+    'asian': 0.33,
+    'south_asian': 0.25,
+    'african': 0.15,
+    'middle_eastern': 0.2,
+    'native_american': 0.3,
+    'pacific_islander': 0.35,
+    'nordic': 0.55,
+    'central_asian': 0.28
+}
+
+# Balancing between serif and sans-serif based on analytical vs creative traits
+FONTS = {
+    'creative_extrovert': Font(
+        'Playfair Display',
+        'Bold, expressive serif font reflecting creativity and confidence'),
+    'creative_introvert': Font(
+        'Cormorant Garamond',
+        'Elegant, delicate serif font with artistic sensibility'),
+    'analytical_extrovert': Font(
+        'Montserrat',
+        'Clean, strong sans-serif with precise character'),
+    'analytical_introvert': Font(
+        'Inter',
+        'Focused, refined sans-serif designed for clarity'),
+    'balanced': Font(
+        'Nunito',
+        'Balanced, versatile sans-serif with rounded terminals')
+}
+
+LAYOUTS = {
+    'bold': Layout(
+        'Bold & Dynamic',
+        'Strong visual elements with high contrast and dynamic spacing'),
+    'minimal': Layout(
+        'Clean & Minimal',
+        'Elegant minimalism with focused content and precise spacing'),
+    'balanced': Layout(
+        'Harmonious & Balanced',
+        'Well-balanced layout with thoughtful spacing and moderation'),
+    'warm': Layout(
+        'Warm & Inviting',
+        'Welcoming layout with soft elements and approachable design'),
+    'structured': Layout(
+        'Structured & Organized',
+        'Structured layout with clear hierarchy and organization')
+}
+
+# Trait thresholds used by select_font and select_layout, keyed
+# '<rule>.<trait>'. Themes record the rule_version() they were built with,
+# so retheme.py can update stored themes after these change.
+RULES = {
+    'font.creativity': 0.6,
+    'font.analytical': 0.6,
+    'font.extroversion': 0.6,
+    'layout.bold.extroversion': 0.7,
+    'layout.bold.risk_taking': 0.7,
+    'layout.minimal.extroversion': 0.4,
+    'layout.minimal.risk_taking': 0.4,
+    'layout.warm.empathy': 0.7,
+    'layout.structured.risk_taking': 0.4,
+    'layout.structured.extroversion': 0.6
+}
+
+def rule_version(rules):
+    """Short fingerprint of a rule set"""
+    data = json.dumps(rules, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:12]
+
+RULE_VERSION = rule_version(RULES)
 
 def hex_to_rgb(hex_color):
     """Convert hex color to RGB tuple"""
@@ -11,6 +96,11 @@ def rgb_to_hex(rgb):
 
 def get_color_from_traits(traits, ancestry):
     """Generate a color based on personality traits and ancestry"""
+    if color_table is not None:
+        colors = color_table.lookup(traits, ancestry)
+        if colors is not None:
+            return colors
+    
     # Base color generation from extroversion and creativity
     extroversion = traits.get('extroversion', 0.5)
     creativity = traits.get('creativity', 0.5)
@@ -50,24 +140,8 @@ def generate_accent_color(primary_rgb, ancestry):
     r, g, b = primary_rgb[0]/255, primary_rgb[1]/255, primary_rgb[2]/255
     h, s, v = colorsys.rgb_to_hsv(r, g, b)
     
-    # Adjust hue based on ancestry - move around the color wheel
-    ancestry_hue_shifts = {
-        'european': 0.5,  # Opposite on color wheel
-        'eastern_european': 0.45,
-        'mediterranean': 0.4,
-        'asian': 0.33,
-        'south_asian': 0.25,
-        'african': 0.15,
-        'middle_eastern': 0.2,
-        'native_american': 0.3,
-        'pacific_islander': 0.35,
-        'nordic': 0.55,
-        'central_asian': 0.28
-    }
-    
-    # Find dominant ancestry
-    dominant_ancestry = max(ancestry.items(), key=lambda x: x[1])[0] if ancestry else 'european'
-    hue_shift = ancestry_hue_shifts.get(dominant_ancestry, 0.5)
+    # Find dominant ancestry and adjust hue based on it
+    hue_shift = ANCESTRY_HUE_SHIFTS.get(dominant_ancestry(ancestry) or 'european', 0.5)
     
     # Apply shift to hue (wrap around if exceeds 1)
     new_hue = (h + hue_shift) % 1.0
@@ -79,161 +153,96 @@ def generate_accent_color(primary_rgb, ancestry):
     
     return rgb_to_hex(new_rgb)
 
+def dominant_ancestry(ancestry):
+    """Key of the largest ancestry share, or None for an empty ancestry"""
+    return max(ancestry, key=ancestry.get) if ancestry else None
+
 def get_font_from_traits(traits):
     """Select a font based on personality traits"""
+    return select_font(traits).to_dict()
+
+def select_font(traits, rules=RULES):
+    """Select the catalog Font for personality traits"""
     extroversion = traits.get('extroversion', 0.5)
     creativity = traits.get('creativity', 0.5)
     analytical = traits.get('analytical', 0.5)
-    
-    # Font selection logic
-    # Balancing between serif and sans-serif based on analytical vs creative traits
-    
-    fonts = {
-        'creative_extrovert': {
-            'name': 'Playfair Display',
-            'description': 'Bold, expressive serif font reflecting creativity and confidence'
-        },
-        'creative_introvert': {
-            'name': 'Cormorant Garamond',
-            'description': 'Elegant, delicate serif font with artistic sensibility'
-        },
-        'analytical_extrovert': {
-            'name': 'Montserrat',
-            'description': 'Clean, strong sans-serif with precise character'
-        },
-        'analytical_introvert': {
-            'name': 'Inter',
-            'description': 'Focused, refined sans-serif designed for clarity'
-        },
-        'balanced': {
-            'name': 'Nunito',
-            'description': 'Balanced, versatile sans-serif with rounded terminals'
-        }
-    }
+    creative = creativity > rules['font.creativity']
+    extrovert = extroversion > rules['font.extroversion']
     
     # Determine which category to use
-    if creativity > 0.6 and extroversion > 0.6:
+    if creative and extrovert:
         font_type = 'creative_extrovert'
-    elif creativity > 0.6 and extroversion <= 0.6:
+    elif creative:
         font_type = 'creative_introvert'
-    elif analytical > 0.6 and extroversion > 0.6:
+    elif analytical > rules['font.analytical'] and extrovert:
         font_type = 'analytical_extrovert'
-    elif analytical > 0.6 and extroversion <= 0.6:
+    elif analytical > rules['font.analytical']:
         font_type = 'analytical_introvert'
     else:
         font_type = 'balanced'
     
-    return fonts[font_type]
+    return FONTS[font_type]
 
 def get_layout_from_traits(traits):
     """Determine layout style based on personality traits"""
+    return select_layout(traits).to_dict()
+
+def select_layout(traits, rules=RULES):
+    """Select the catalog Layout for personality traits"""
     extroversion = traits.get('extroversion', 0.5)
     risk_taking = traits.get('risk_taking', 0.5)
     empathy = traits.get('empathy', 0.5)
     
-    layouts = {
-        'bold': {
-            'name': 'Bold & Dynamic',
-            'description': 'Strong visual elements with high contrast and dynamic spacing'
-        },
-        'minimal': {
-            'name': 'Clean & Minimal',
-            'description': 'Elegant minimalism with focused content and precise spacing'
-        },
-        'balanced': {
-            'name': 'Harmonious & Balanced',
-            'description': 'Well-balanced layout with thoughtful spacing and moderation'
-        },
-        'warm': {
-            'name': 'Warm & Inviting',
-            'description': 'Welcoming layout with soft elements and approachable design'
-        },
-        'structured': {
-            'name': 'Structured & Organized',
-            'description': 'Structured layout with clear hierarchy and organization'
-        }
-    }
-    
     # Determine layout based on trait combinations
-    if extroversion > 0.7 and risk_taking > 0.7:
+    if (extroversion > rules['layout.bold.extroversion']
+            and risk_taking > rules['layout.bold.risk_taking']):
         layout = 'bold'
-    elif extroversion < 0.4 and risk_taking < 0.4:
+    elif (extroversion < rules['layout.minimal.extroversion']
+            and risk_taking < rules['layout.minimal.risk_taking']):
         layout = 'minimal'
-    elif empathy > 0.7:
+    elif empathy > rules['layout.warm.empathy']:
         layout = 'warm'
-    elif risk_taking < 0.4 and extroversion > 0.6:
+    elif (risk_taking < rules['layout.structured.risk_taking']
+            and extroversion > rules['layout.structured.extroversion']):
         layout = 'structured'
     else:
         layout = 'balanced'
     
-    return layouts[layout]
+    return LAYOUTS[layout]
 
-def generate_theme_explanation(theme, traits, ancestry):
+def generate_theme_explanation(theme, traits, ancestry, locale='en'):
     """Create a human-readable explanation of the theme and why it was chosen"""
-    # Get dominant ancestry
-    dominant_ancestry = max(ancestry.items(), key=lambda x: x[1])[0] if ancestry else 'mixed'
-    ancestry_readable = dominant_ancestry.replace('_', ' ').title()
-    
-    # Personality descriptions
-    if traits.get('extroversion', 0.5) > 0.7:
-        personality = "highly extroverted"
-    elif traits.get('extroversion', 0.5) < 0.3:
-        personality = "more introverted"
-    else:
-        personality = "balanced"
-        
-    if traits.get('creativity', 0.5) > 0.7:
-        creativity = "very creative"
-    elif traits.get('creativity', 0.5) < 0.3:
-        creativity = "practical"
-    else:
-        creativity = "moderately creative"
-        
-    if traits.get('analytical', 0.5) > 0.7:
-        analytical = "analytical"
-    else:
-        analytical = "intuitive"
+    # Imported here because explanations imports dominant_ancestry from this module
+    from explanations import render_explanation
+    return render_explanation(theme, traits, ancestry, locale)
+
+def build_theme_model(dna_data, rules=RULES):
+    """Generate a compact Theme for the DNA data, raising on invalid input"""
+    traits = dna_data.get('personality_traits', {})
+    ancestry = dna_data.get('ancestry', {})
+    
+    colors = get_color_from_traits(traits, ancestry)
+    return Theme(colors['primary'], colors['accent'],
+                 select_font(traits, rules), select_layout(traits, rules))
+
+def build_theme(dna_data, rules=RULES):
+    """Generate a theme based on the DNA data, raising on invalid input"""
+    # Extract relevant data
+    traits = dna_data.get('personality_traits', {})
+    ancestry = dna_data.get('ancestry', {})
+    
+    # Generate colors, font and layout, then expand them to the theme dict
+    theme = build_theme_model(dna_data, rules).to_dict()
     
-    # Put together explanation
-    explanation = f"""Your theme reflects your {personality} and {creativity} nature, with {ancestry_readable} 
-    ancestry influences. The {theme['colors']['primary']} primary color represents your {personality} 
-    tendencies, while the {theme['font']['name']} font was selected to complement your 
-    {creativity} and {analytical} traits. The {theme['layout']['name']} layout style 
-    brings everything together in a way that resonates with your unique personality profile."""
+    # Generate text explanation
+    explanation = generate_theme_explanation(theme, traits, ancestry)
     
-    return explanation
+    return theme, explanation
 
 def generate_theme(dna_data):
     """Generate a theme based on the DNA data"""
     try:
-        # Extract relevant data
-        traits = dna_data.get('personality_traits', {})
-        ancestry = dna_data.get('ancestry', {})
-        
-        # Generate colors
-        colors = get_color_from_traits(traits, ancestry)
-        
-        # Select font
-        font = get_font_from_traits(traits)
-        
-        # Determine layout style
-        layout = get_layout_from_traits(traits)
-        
-        # Prepare theme data
-        theme = {
-            'colors': colors,
-            'font': font,
-            'layout': layout,
-            'bg_color': colors['primary'],
-            'accent_color': colors['accent'],
-            'font_name': font['name'],
-            'layout_style': layout['name']
-        }
-        
-        # Generate text explanation
-        explanation = generate_theme_explanation(theme, traits, ancestry)
-        
-        return theme, explanation
+        return build_theme(dna_data)
         
     except Exception as e:
         print(f"Error generating theme: {e}")
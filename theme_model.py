@@ -0,0 +1,60 @@
+"""Compact, immutable value types for themes and the profiles they come from.
+
+Fonts and layouts are shared catalog instances (see theme_logic.FONTS and
+theme_logic.LAYOUTS), so a Theme holds two hex strings and two references.
+to_dict() produces the nested dict shape the templates and JSON output use.
+"""
+from typing import NamedTuple, Optional
+
+
+class Font(NamedTuple):
+    name: str
+    description: str
+
+    def to_dict(self):
+        return {'name': self.name, 'description': self.description}
+
+
+class Layout(NamedTuple):
+    name: str
+    description: str
+
+    def to_dict(self):
+        return {'name': self.name, 'description': self.description}
+
+
+class Theme(NamedTuple):
+    primary: str
+    accent: str
+    font: Font
+    layout: Layout
+
+    def to_dict(self):
+        """Return the theme dict generate_theme has always produced"""
+        return {
+            'colors': {'primary': self.primary, 'accent': self.accent},
+            'font': self.font.to_dict(),
+            'layout': self.layout.to_dict(),
+            'bg_color': self.primary,
+            'accent_color': self.accent,
+            'font_name': self.font.name,
+            'layout_style': self.layout.name
+        }
+
+
+class Profile(NamedTuple):
+    """The parts of a DNA profile that theme generation reads"""
+
+    name: Optional[str]
+    traits: dict
+    ancestry: dict
+    color_preferences: Optional[dict] = None
+
+    def to_dna_data(self):
+        """Return the dict shape generate_theme expects"""
+        dna_data = {'personality_traits': self.traits, 'ancestry': self.ancestry}
+        if self.name is not None:
+            dna_data['name'] = self.name
+        if self.color_preferences:
+            dna_data['color_preferences'] = self.color_preferences
+        return dna_data
@@ -0,0 +1,145 @@
+"""Server-side storage for generated themes.
+
+The session only carries a short theme ID, and the theme and explanation
+live in a store shared by every worker that points at the same backend:
+
+    memory                    in-process LRU, for a single worker
+    sqlite:///path/themes.db  SQLite file, shared by workers on one host
+
+IDs are derived from the stored content, so identical themes share a row.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def theme_id(payload):
+    """Content-derived ID for a serialized theme payload"""
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def serialize(theme, explanation):
+    return json.dumps({'theme': theme, 'explanation': explanation}, sort_keys=True,
+                      separators=(',', ':'))
+
+
+def deserialize(payload):
+    data = json.loads(payload)
+    return data['theme'], data['explanation']
+
+
+class MemoryThemeStore:
+    """In-process LRU theme store with expiry"""
+
+    def __init__(self, max_size=10000, ttl=24 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, theme, explanation):
+        """Store a theme and return its ID"""
+        payload = serialize(theme, explanation)
+        key = theme_id(payload)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return key
+
+    def get(self, key):
+        """Return (theme, explanation) for an ID, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return deserialize(payload)
+
+    def compact(self):
+        """Drop expired themes and return how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteThemeStore:
+    """Theme store backed by a SQLite file, safe to share between processes"""
+
+    # Run compaction after this many writes
+    COMPACT_EVERY = 1000
+
+    def __init__(self, path, ttl=24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS themes ('
+                ' id TEXT PRIMARY KEY, payload TEXT NOT NULL, expires REAL NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS themes_expires ON themes (expires)')
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def put(self, theme, explanation):
+        """Store a theme and return its ID"""
+        payload = serialize(theme, explanation)
+        key = theme_id(payload)
+        with self._connection() as db:
+            db.execute(
+                'INSERT INTO themes (id, payload, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET expires = excluded.expires',
+                (key, payload, time.time() + self.ttl))
+        self._writes += 1
+        if self._writes % self.COMPACT_EVERY == 0:
+            self.compact()
+        return key
+
+    def get(self, key):
+        """Return (theme, explanation) for an ID, or None if unknown or expired"""
+        row = self._connection().execute(
+            'SELECT payload FROM themes WHERE id = ? AND expires > ?',
+            (key, time.time())).fetchone()
+        return deserialize(row[0]) if row else None
+
+    def compact(self):
+        """Delete expired themes and return how many were removed"""
+        with self._connection() as db:
+            return db.execute('DELETE FROM themes WHERE expires <= ?', (time.time(),)).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM themes').fetchone()[0]
+
+
+def create_store(url, ttl=24 * 60 * 60):
+    """Create a theme store from a 'memory' or 'sqlite:///path' URL"""
+    if url == 'memory':
+        return MemoryThemeStore(ttl=ttl)
+    if url.startswith('sqlite:///'):
+        return SQLiteThemeStore(url[len('sqlite:///'):], ttl=ttl)
+    raise ValueError(f"Unknown theme store: {url}")
@@ -0,0 +1,176 @@
+"""Precomputed color lookup table for two-decimal trait values.
+
+Primary and accent colors depend only on extroversion, creativity and
+analytical plus the dominant ancestry's hue shift. At two-decimal precision
+that is 101 ** 3 trait cells times 11 hue shifts, small enough to compute
+once and store as a memory-mappable .npy file:
+
+    python theme_table.py build -o theme_table.npy
+    python theme_table.py verify theme_table.npy --sample 100000
+
+Once installed with theme_table.install(path), theme_logic consults the
+table before doing any colorsys conversions. Trait values that are not
+exact two-decimal numbers in [0, 1] still take the live path.
+"""
+import argparse
+import random
+import sys
+
+import numpy as np
+
+import theme_logic
+from theme_batch import ANCESTRY_HUE_SHIFTS, hsv_to_rgb, rgb_to_hsv, scale_channel
+
+DEFAULT_PATH = 'theme_table.npy'
+
+STEPS = 101
+
+# Column 0 of the last-but-one axis is the primary color, the rest are the
+# accent colors in ANCESTRY_HUE_SHIFTS order
+ANCESTRY_COLUMNS = {name: column for column, name in enumerate(ANCESTRY_HUE_SHIFTS, start=1)}
+DEFAULT_COLUMN = ANCESTRY_COLUMNS['european']
+
+def build_table():
+    """Compute the color table as a (101, 101, 101, 12, 3) uint8 array"""
+    grid = np.arange(STEPS) / 100
+    extroversion, creativity, analytical = np.meshgrid(grid, grid, grid, indexing='ij')
+
+    base_hue = 0.6 - (extroversion.ravel() * 0.4)
+    saturation = 0.5 + (creativity.ravel() * 0.5)
+    value = 0.7 + (analytical.ravel() * 0.3)
+    primary = [scale_channel(c) for c in hsv_to_rgb(base_hue, saturation, value)]
+
+    table = np.empty((STEPS ** 3, len(ANCESTRY_HUE_SHIFTS) + 1, 3), dtype=np.uint8)
+    table[:, 0] = np.stack(primary, axis=1)
+
+    h, s, v = rgb_to_hsv(primary[0] / 255, primary[1] / 255, primary[2] / 255)
+    for name, column in ANCESTRY_COLUMNS.items():
+        new_hue = np.mod(h + ANCESTRY_HUE_SHIFTS[name], 1.0)
+        table[:, column] = np.stack([scale_channel(c) for c in hsv_to_rgb(new_hue, s, v)], axis=1)
+
+    return table.reshape(STEPS, STEPS, STEPS, len(ANCESTRY_HUE_SHIFTS) + 1, 3)
+
+
+def _index(value):
+    """Return the table index of a trait value, or None if it has no cell"""
+    if type(value) not in (float, int, bool):
+        return None
+    index = round(value * 100)
+    if 0 <= index < STEPS and index / 100 == value:
+        return index
+    return None
+
+
+class ColorTable:
+    """Read-only view of a built color table"""
+
+    def __init__(self, table):
+        self.table = table
+        # Plain byte offsets into the buffer are much cheaper than NumPy
+        # scalar indexing on the per-request path
+        self._buffer = memoryview(np.ascontiguousarray(table).reshape(-1)).cast('B')
+        self._cell_size = (len(ANCESTRY_HUE_SHIFTS) + 1) * 3
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """Memory-map a table written by save_table"""
+        return cls(np.load(path, mmap_mode='r'))
+
+    def lookup(self, traits, ancestry):
+        """Return get_color_from_traits' result, or None if not tabulated"""
+        e = _index(traits.get('extroversion', 0.5))
+        c = _index(traits.get('creativity', 0.5))
+        a = _index(traits.get('analytical', 0.5))
+        if e is None or c is None or a is None:
+            return None
+
+        try:
+            column = DEFAULT_COLUMN
+            if ancestry:
+                column = ANCESTRY_COLUMNS.get(theme_logic.dominant_ancestry(ancestry), DEFAULT_COLUMN)
+        except Exception:
+            return None
+
+        offset = ((e * STEPS + c) * STEPS + a) * self._cell_size
+        accent = offset + column * 3
+        return {
+            'primary': '#' + self._buffer[offset:offset + 3].hex(),
+            'accent': '#' + self._buffer[accent:accent + 3].hex()
+        }
+
+
+def save_table(table, path=DEFAULT_PATH):
+    np.save(path, table, allow_pickle=False)
+
+
+def install(path=DEFAULT_PATH):
+    """Load a table and make theme_logic use it"""
+    theme_logic.color_table = ColorTable.load(path)
+    return theme_logic.color_table
+
+
+def uninstall():
+    theme_logic.color_table = None
+
+
+def verify(table, sample=None, seed=0):
+    """Diff table cells against the live color functions.
+
+    Checks every cell, or a random sample of them. Returns a list of
+    (traits, ancestry, expected, actual) mismatches.
+    """
+    cells = [(e, c, a) for e in range(STEPS) for c in range(STEPS) for a in range(STEPS)]
+    if sample is not None and sample < len(cells):
+        cells = random.Random(seed).sample(cells, sample)
+
+    color_table = ColorTable(table)
+    installed = theme_logic.color_table
+    theme_logic.color_table = None
+    mismatches = []
+    try:
+        for e, c, a in cells:
+            traits = {'extroversion': e / 100, 'creativity': c / 100, 'analytical': a / 100}
+            for name in ANCESTRY_COLUMNS:
+                ancestry = {name: 1.0}
+                expected = theme_logic.get_color_from_traits(traits, ancestry)
+                actual = color_table.lookup(traits, ancestry)
+                if actual != expected:
+                    mismatches.append((traits, ancestry, expected, actual))
+    finally:
+        theme_logic.color_table = installed
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the precomputed theme color table")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_command = commands.add_parser('build', help="compute and save the table")
+    build_command.add_argument('-o', '--output', default=DEFAULT_PATH)
+
+    verify_command = commands.add_parser('verify', help="diff a saved table against theme_logic")
+    verify_command.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    verify_command.add_argument('--sample', type=int, default=None,
+                                help="check N random trait cells instead of all of them")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        table = build_table()
+        save_table(table, args.output)
+        print(f"Wrote {args.output} ({table.nbytes // 1024} KiB)")
+        return 0
+
+    table = ColorTable.load(args.path).table
+    if table.shape != (STEPS, STEPS, STEPS, len(ANCESTRY_HUE_SHIFTS) + 1, 3):
+        print(f"Unexpected table shape {table.shape}")
+        return 1
+    mismatches = verify(table, args.sample)
+    for traits, ancestry, expected, actual in mismatches[:20]:
+        print(f"Mismatch for {traits} {ancestry}: expected {expected}, table has {actual}")
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())